@@ -5,22 +5,130 @@ Uses Device Code Flow for interactive user authentication.
 Requires Fabric Administrator permissions to add users to any workspace.
 """
 
+import asyncio
+import atexit
+import json
+import os
+import re
 import requests
-from msal import PublicClientApplication
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+
+try:
+    import httpx  # optional: enables the async fan-out path
+except ImportError:
+    httpx = None
+
+try:
+    import orjson  # optional: 3-5x faster JSON parsing of large API responses
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: incremental parse of very large API responses
+except ImportError:
+    ijson = None
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from msal import PublicClientApplication, SerializableTokenCache
 from typing import Optional, List, Dict
 
+
+def _json_loads(content: bytes):
+    """Parse response bytes with orjson when available, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _json_dumps(obj) -> bytes:
+    """Encode a request body to JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
 # Configuration
 CLIENT_ID = "client-id"  # Azure CLI Public Client ID
 TENANT_ID = "tenant-id"  # Your Tenant ID
 AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
 SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
 PBI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
+TOKEN_CACHE_PATH = os.path.expanduser("~/.pbi_token_cache.bin")
+
+# Shared HTTP session with keep-alive + connection pooling.
+# Reusing one session avoids a fresh TCP+TLS handshake per API call, which
+# dominates wall time when iterating over many workspaces ('all' option).
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST", "PUT"],
+        respect_retry_after_header=True
+    )
+))
+
+# Ledger of (workspace_id, email) adds that already succeeded; lets a rerun
+# after a partial failure touch only the remaining workspaces.
+COMPLETED_ADDS_PATH = ".pbi_admin_adds_done.json"
+
+# Menu choice -> Power BI access right
+ACCESS_MAP = {
+    "1": "Admin",
+    "2": "Member",
+    "3": "Contributor",
+    "4": "Viewer"
+}
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Number of concurrent workers for the multi-workspace add path.
+# Keep <= the session pool size so connections are reused, not re-opened.
+MAX_ADD_WORKERS = 16
+
+# Sub-requests per $batch envelope (Graph-style batch limit)
+BATCH_SIZE = 20
+
+# Serializes console output from worker threads
+_PRINT_LOCK = threading.Lock()
+
+
+def _load_token_cache() -> SerializableTokenCache:
+    """
+    Load the MSAL token cache from disk (if present) and register a save
+    hook at exit. The persisted refresh token lets acquire_token_silent
+    succeed on later runs, skipping the device-code flow entirely.
+    """
+    cache = SerializableTokenCache()
+
+    if os.path.exists(TOKEN_CACHE_PATH):
+        with open(TOKEN_CACHE_PATH) as f:
+            cache.deserialize(f.read())
+
+    def _save_cache():
+        if cache.has_state_changed:
+            with open(TOKEN_CACHE_PATH, "w") as f:
+                f.write(cache.serialize())
+            os.chmod(TOKEN_CACHE_PATH, 0o600)  # cache holds refresh tokens
+
+    atexit.register(_save_cache)
+    return cache
 
 
 def get_access_token_interactive() -> Optional[str]:
     """Authenticate using Device Code Flow."""
-    app = PublicClientApplication(CLIENT_ID, authority=AUTHORITY)
-    
+    # http_cache={} gives MSAL a throwaway per-run HTTP response cache:
+    # a shared/persisted cache can replay 400 "authorization_pending"
+    # responses during device-code polling, stalling login until expiry.
+    app = PublicClientApplication(CLIENT_ID, authority=AUTHORITY,
+                                  token_cache=_load_token_cache(),
+                                  http_cache={})
+
     accounts = app.get_accounts()
     if accounts:
         print("Found cached authentication, attempting silent login...")
@@ -51,22 +159,33 @@ def get_access_token_interactive() -> Optional[str]:
         return None
 
 
-def get_workspaces(access_token: str, use_admin_api: bool = True, exclude_personal: bool = True, 
-                   capacity_ids: List[str] = None) -> List[Dict]:
+def get_workspaces(access_token: str, use_admin_api: bool = True, exclude_personal: bool = True,
+                   capacity_ids: List[str] = None, page_size: int = 5000) -> List[Dict]:
     """Get all workspaces. Use admin API to get ALL workspaces in tenant."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
     if use_admin_api:
-        # Admin API returns ALL workspaces in the tenant
-        url = f"{PBI_API_BASE}/admin/groups?$top=5000"
+        # Admin API returns ALL workspaces in the tenant, but caps each
+        # response at $top items — page with $skip until a short page so
+        # tenants with more than page_size workspaces aren't truncated.
+        workspaces = []
+        skip = 0
+        while True:
+            url = f"{PBI_API_BASE}/admin/groups?$top={page_size}&$skip={skip}"
+            response = _SESSION.get(url)
+            response.raise_for_status()
+
+            value = _json_loads(response.content).get("value", [])
+            workspaces.extend(value)
+
+            if len(value) < page_size:
+                break
+            skip += page_size
     else:
         # Regular API only returns workspaces user has access to
         url = f"{PBI_API_BASE}/groups"
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    workspaces = response.json().get("value", [])
+        response = _SESSION.get(url)
+        response.raise_for_status()
+
+        workspaces = _json_loads(response.content).get("value", [])
     
     # Filter out personal workspaces if requested
     if exclude_personal:
@@ -82,54 +201,131 @@ def get_workspaces(access_token: str, use_admin_api: bool = True, exclude_person
 
 def get_workspace_users(access_token: str, workspace_id: str, use_admin_api: bool = True) -> List[Dict]:
     """Get all users in a workspace."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
     if use_admin_api:
         url = f"{PBI_API_BASE}/admin/groups/{workspace_id}/users"
     else:
         url = f"{PBI_API_BASE}/groups/{workspace_id}/users"
     
+    # No bare except here: swallowing a 429/503 made the caller believe the
+    # user was absent and fire a POST that was doomed to fail too. The
+    # session's mounted Retry already backs off on throttling (honoring
+    # Retry-After); anything that survives it is a real error and should
+    # propagate to the caller.
+    response = _SESSION.get(url)
+    response.raise_for_status()
+    return _json_loads(response.content).get("value", [])
+
+
+_COMPLETED_LOCK = threading.Lock()
+
+
+def _load_completed_adds() -> set:
+    """Load the set of 'workspace_id|email' keys already added successfully."""
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("value", [])
-    except:
-        return []
+        with open(COMPLETED_ADDS_PATH) as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+
+def _record_completed_add(completed: set, workspace_id: str, user_email: str):
+    """Mark an add as done and flush the ledger (thread-safe)."""
+    with _COMPLETED_LOCK:
+        completed.add(f"{workspace_id}|{user_email.lower()}")
+        with open(COMPLETED_ADDS_PATH, "w") as f:
+            json.dump(sorted(completed), f)
+
+
+def _user_set(users: List[Dict]) -> set:
+    """Build the set of lowercased emails/UPNs for a workspace's user list."""
+    return ({(u.get("emailAddress") or "").lower() for u in users} |
+            {(u.get("userPrincipalName") or "").lower() for u in users})
+
+
+def get_workspaces_with_users(access_token: str, page_size: int = 5000) -> Dict[str, set]:
+    """
+    Fetch users for ALL workspaces in one paginated pass using $expand=users.
+    Returns a dict mapping workspace_id -> set of lowercased emails/UPNs.
+
+    Much cheaper than one GET per workspace when adding a user to many
+    workspaces: membership checks become in-memory set lookups.
+    """
+    users_by_workspace = {}
+    skip = 0
+
+    while True:
+        url = f"{PBI_API_BASE}/admin/groups?$expand=users&$top={page_size}&$skip={skip}"
+
+        if ijson is not None:
+            # Stream the page: build each workspace's user set as bytes
+            # arrive instead of materializing the whole response in memory.
+            with _SESSION.get(url, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True  # undo gzip for ijson
+                page_count = 0
+                for ws in ijson.items(response.raw, "value.item"):
+                    users_by_workspace[ws["id"]] = _user_set(ws.get("users", []))
+                    page_count += 1
+        else:
+            response = _SESSION.get(url)
+            response.raise_for_status()
+
+            value = _json_loads(response.content).get("value", [])
+            for ws in value:
+                users_by_workspace[ws["id"]] = _user_set(ws.get("users", []))
+            page_count = len(value)
+
+        if page_count < page_size:
+            break
+        skip += page_size
+
+    return users_by_workspace
 
 
 def user_exists_in_workspace(access_token: str, workspace_id: str, user_email: str) -> bool:
     """Check if a user already has access to a workspace."""
+    email_lower = user_email.lower()
+
+    # Let the server filter down to the single matching user instead of
+    # shipping (and parsing) the whole membership list.
+    filter_expr = quote(
+        f"tolower(emailAddress) eq '{email_lower}' "
+        f"or tolower(userPrincipalName) eq '{email_lower}'"
+    )
+    url = f"{PBI_API_BASE}/admin/groups/{workspace_id}/users?$filter={filter_expr}"
+
+    response = _SESSION.get(url)
+    if response.status_code == 200:
+        return bool(_json_loads(response.content).get("value"))
+
+    # Some tenants reject $filter on this endpoint — fall back to a full scan
     users = get_workspace_users(access_token, workspace_id, use_admin_api=True)
-    user_email_lower = user_email.lower()
-    
-    for user in users:
-        email = user.get("emailAddress", "").lower()
-        upn = user.get("userPrincipalName", "").lower()
-        if user_email_lower == email or user_email_lower == upn:
-            return True
-    return False
+    return email_lower in _user_set(users)
 
 
-def add_user_to_workspace(access_token: str, workspace_id: str, user_email: str, 
-                          access_right: str = "Admin", use_admin_api: bool = True) -> bool:
+def add_user_to_workspace(access_token: str, workspace_id: str, user_email: str,
+                          access_right: str = "Admin", use_admin_api: bool = True,
+                          existing_users: Optional[set] = None,
+                          skip_existence_check: bool = True) -> bool:
     """
     Add a user to a workspace with specified access right.
-    
+
     Args:
         access_token: Bearer token for authentication
         workspace_id: GUID of the workspace
         user_email: Email address of the user to add
         access_right: One of 'Admin', 'Contributor', 'Member', 'Viewer'
         use_admin_api: If True, uses Admin API (requires Fabric Admin permissions)
-    
+        existing_users: Optional prefetched set of lowercased emails/UPNs already
+            in the workspace (from get_workspaces_with_users). When provided,
+            the per-workspace existence GET is skipped.
+        skip_existence_check: When True (default), don't issue the existence
+            GET — the POST's 400 AlreadyExists response already covers
+            duplicates, so the happy path is one round trip instead of two.
+
     Returns:
         True if successful, False otherwise
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
     # Use Admin API for tenant-wide access
     if use_admin_api:
         url = f"{PBI_API_BASE}/admin/groups/{workspace_id}/users"
@@ -142,12 +338,18 @@ def add_user_to_workspace(access_token: str, workspace_id: str, user_email: str,
     }
     
     try:
-        # First check if user already exists in workspace
-        if user_exists_in_workspace(access_token, workspace_id, user_email):
+        # Duplicate detection: a prefetched membership set is a free
+        # in-memory lookup; otherwise rely on the POST's AlreadyExists
+        # handling below unless the caller asked for an explicit GET first.
+        if existing_users is not None:
+            if user_email.lower() in existing_users:
+                print(f"ℹ User already has access to this workspace")
+                return True
+        elif not skip_existence_check and user_exists_in_workspace(access_token, workspace_id, user_email):
             print(f"ℹ User already has access to this workspace")
             return True
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = _SESSION.post(url, data=_json_dumps(payload))
         
         if response.status_code == 200:
             print(f"✓ Successfully added '{user_email}' as {access_right} to workspace")
@@ -178,7 +380,133 @@ def add_user_to_workspace(access_token: str, workspace_id: str, user_email: str,
         return False
 
 
-def update_user_in_workspace(access_token: str, workspace_id: str, user_email: str, 
+def add_users_batch(access_token: str, assignments: List[tuple]) -> Optional[List[bool]]:
+    """
+    Add up to BATCH_SIZE users in one HTTP round trip using a Graph-style
+    $batch envelope of POST sub-requests.
+
+    Args:
+        access_token: Bearer token for authentication
+        assignments: list of (workspace_id, user_email, access_right) tuples
+
+    Returns:
+        One bool per assignment (in order), or None when the service does
+        not support batching — callers should then fall back to
+        per-workspace adds.
+    """
+    url = f"{PBI_API_BASE}/$batch"
+    body = {
+        "requests": [
+            {
+                "id": str(i),
+                "method": "POST",
+                "url": f"/admin/groups/{ws_id}/users",
+                "headers": {"Content-Type": "application/json"},
+                "body": {"emailAddress": email, "groupUserAccessRight": right}
+            }
+            for i, (ws_id, email, right) in enumerate(assignments)
+        ]
+    }
+
+    response = _SESSION.post(url, data=_json_dumps(body))
+
+    # Tenants/endpoints without batch support answer 400/404/405/501
+    if response.status_code in (400, 404, 405, 501):
+        return None
+    response.raise_for_status()
+
+    responses_by_id = {r.get("id"): r for r in _json_loads(response.content).get("responses", [])}
+
+    results = []
+    for i in range(len(assignments)):
+        sub = responses_by_id.get(str(i), {})
+        status = sub.get("status", 0)
+        sub_body = sub.get("body", "")
+        if not isinstance(sub_body, str):
+            sub_body = json.dumps(sub_body)
+        # Same dedup semantics as the single-add path: 400 AlreadyExists is OK
+        results.append(status == 200 or (status == 400 and "AlreadyExists" in sub_body))
+    return results
+
+
+async def _add_user_async(client, semaphore, workspace_id: str, user_email: str,
+                          access_right: str, existing_users: Optional[set] = None,
+                          max_attempts: int = 4) -> bool:
+    """
+    Async counterpart of add_user_to_workspace (admin API, POST only).
+    httpx bypasses the requests session's Retry, so throttled/5xx responses
+    are retried here with the same semantics: bounded attempts, honoring a
+    numeric Retry-After and falling back to exponential backoff otherwise.
+    """
+    if existing_users is not None and user_email.lower() in existing_users:
+        return True
+
+    url = f"{PBI_API_BASE}/admin/groups/{workspace_id}/users"
+    payload = {
+        "emailAddress": user_email,
+        "groupUserAccessRight": access_right
+    }
+
+    backoff = 1.0
+    for attempt in range(max_attempts):
+        async with semaphore:
+            response = await client.post(url, json=payload)
+
+        if response.status_code == 200:
+            return True
+        if response.status_code == 400:
+            response_text = response.text
+            if "AlreadyExists" in response_text or "already exists" in response_text.lower():
+                return True
+            return False
+        if response.status_code in (429, 500, 502, 503, 504) and attempt < max_attempts - 1:
+            try:
+                wait = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                wait = backoff  # absent or HTTP-date form: use backoff
+            await asyncio.sleep(wait)
+            backoff = min(backoff * 2, 30)
+            continue
+        return False
+
+    return False
+
+
+def add_users_async(access_token: str, target_workspaces: List[Dict], user_email: str,
+                    access_right: str, existing_users_map: Dict[str, set]) -> List:
+    """
+    Fan the adds out over one shared httpx.AsyncClient. A single event loop
+    keeps all requests in flight over a handful of pooled (HTTP/2 when
+    available) connections instead of one socket per worker thread.
+    Returns one result (bool or exception) per workspace, in input order.
+    """
+    async def _run():
+        semaphore = asyncio.Semaphore(32)  # backpressure against PBI throttling
+        try:
+            client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=50),
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+        except ImportError:
+            # h2 not installed; plain HTTP/1.1 keep-alive still pools fine
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=50),
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+
+        async with client:
+            return await asyncio.gather(
+                *(_add_user_async(client, semaphore, ws['id'], user_email, access_right,
+                                  existing_users_map.get(ws['id']))
+                  for ws in target_workspaces),
+                return_exceptions=True
+            )
+
+    return asyncio.run(_run())
+
+
+def update_user_in_workspace(access_token: str, workspace_id: str, user_email: str,
                              access_right: str = "Admin", use_admin_api: bool = True) -> bool:
     """
     Update an existing user's permissions in a workspace.
@@ -193,11 +521,6 @@ def update_user_in_workspace(access_token: str, workspace_id: str, user_email: s
     Returns:
         True if successful, False otherwise
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
     # Use Admin API for tenant-wide access
     if use_admin_api:
         url = f"{PBI_API_BASE}/admin/groups/{workspace_id}/users"
@@ -210,7 +533,7 @@ def update_user_in_workspace(access_token: str, workspace_id: str, user_email: s
     }
     
     try:
-        response = requests.put(url, headers=headers, json=payload)
+        response = _SESSION.put(url, data=_json_dumps(payload))
         
         if response.status_code == 200:
             print(f"✓ Successfully updated '{user_email}' to {access_right}")
@@ -225,9 +548,20 @@ def update_user_in_workspace(access_token: str, workspace_id: str, user_email: s
         return False
 
 
-def find_workspace_by_name(workspaces: List[Dict], name: str) -> Optional[Dict]:
-    """Find a workspace by name (case-insensitive partial match)."""
+def find_workspace_by_name(workspaces: List[Dict], name: str,
+                           by_name_lower: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+    """
+    Find a workspace by name (case-insensitive, exact match preferred).
+    Pass a precomputed name_lower -> workspace dict to make exact matches
+    O(1); the substring scan only runs when there is no exact hit.
+    """
     name_lower = name.lower()
+
+    if by_name_lower is not None:
+        ws = by_name_lower.get(name_lower)
+        if ws:
+            return ws
+
     for ws in workspaces:
         if name_lower in ws.get("name", "").lower():
             return ws
@@ -242,11 +576,18 @@ def main():
     # Authenticate
     print("Authenticating...")
     access_token = get_access_token_interactive()
-    
+
     if not access_token:
         print("✗ Failed to authenticate")
         return
-    
+
+    # Set auth + content type once as session defaults; every helper call
+    # rides on them instead of rebuilding a headers dict per request.
+    _SESSION.headers.update({
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    })
+
     # Ask for capacity filter
     print("\nFilter by Capacity ID?")
     print("  - Enter capacity IDs separated by comma")
@@ -262,7 +603,12 @@ def main():
     print("\nFetching workspaces...")
     workspaces = get_workspaces(access_token, capacity_ids=capacity_ids)
     print(f"Found {len(workspaces)} workspaces\n")
-    
+
+    # Index once so ID / exact-name lookups are O(1) instead of re-scanning
+    # the whole list on every selection attempt
+    workspaces_by_id = {ws['id']: ws for ws in workspaces}
+    workspaces_by_name_lower = {ws.get('name', '').lower(): ws for ws in workspaces}
+
     # List workspaces
     print("Available workspaces:")
     print("-"*60)
@@ -300,16 +646,16 @@ def main():
             return
     else:
         # Try to find by name or ID
-        ws = find_workspace_by_name(workspaces, workspace_input)
+        ws = find_workspace_by_name(workspaces, workspace_input,
+                                    by_name_lower=workspaces_by_name_lower)
         if ws:
             target_workspaces = [ws]
         else:
             # Try by ID
-            for ws in workspaces:
-                if ws['id'] == workspace_input:
-                    target_workspaces = [ws]
-                    break
-        
+            ws = workspaces_by_id.get(workspace_input)
+            if ws:
+                target_workspaces = [ws]
+
         if not target_workspaces:
             print(f"No workspace found matching '{workspace_input}'")
             return
@@ -317,7 +663,7 @@ def main():
     # Get user email to add
     user_email = input("\nEnter user email to add as Admin: ").strip()
     
-    if not user_email or '@' not in user_email:
+    if not EMAIL_RE.match(user_email):
         print("Invalid email address")
         return
     
@@ -329,15 +675,8 @@ def main():
     print("  4. Viewer (read only)")
     
     access_choice = input("Select access level [1]: ").strip() or "1"
-    
-    access_map = {
-        "1": "Admin",
-        "2": "Member", 
-        "3": "Contributor",
-        "4": "Viewer"
-    }
-    
-    access_right = access_map.get(access_choice, "Admin")
+
+    access_right = ACCESS_MAP.get(access_choice, "Admin")
     
     # Confirm
     print(f"\n{'='*60}")
@@ -362,13 +701,99 @@ def main():
     
     success_count = 0
     fail_count = 0
-    
+
+    # For multi-workspace adds, fetch all memberships in one bulk pass so the
+    # workers skip the per-workspace existence GET (halves the request count).
+    existing_users_map = {}
+    if len(target_workspaces) > 1:
+        print("Prefetching workspace memberships...")
+        try:
+            existing_users_map = get_workspaces_with_users(access_token)
+        except Exception as e:
+            print(f"Warning: membership prefetch failed ({e}), using per-workspace checks")
+
+    # Single-flight dedup: skip adds that already succeeded in an earlier
+    # (possibly partially failed) run, so reruns only touch the remainder.
+    completed_adds = _load_completed_adds()
+    pending = []
     for ws in target_workspaces:
-        print(f"\nWorkspace: {ws['name']}")
-        if add_user_to_workspace(access_token, ws['id'], user_email, access_right):
+        if f"{ws['id']}|{user_email.lower()}" in completed_adds:
+            print(f"Workspace: {ws['name']} -> already added in a previous run, skipping")
             success_count += 1
         else:
-            fail_count += 1
+            pending.append(ws)
+    target_workspaces = pending
+
+    # First choice on the bulk path: Graph-style $batch, up to BATCH_SIZE
+    # adds per HTTP round trip. Not every tenant exposes batching, so fall
+    # back to the concurrent per-workspace paths below when unsupported.
+    batch_results = None
+    if len(target_workspaces) > BATCH_SIZE:
+        batch_results = []
+        try:
+            for i in range(0, len(target_workspaces), BATCH_SIZE):
+                chunk = target_workspaces[i:i + BATCH_SIZE]
+                chunk_results = add_users_batch(
+                    access_token,
+                    [(ws['id'], user_email, access_right) for ws in chunk])
+                if chunk_results is None:
+                    print("Batch endpoint not supported, using per-workspace adds")
+                    batch_results = None
+                    break
+                batch_results.extend(chunk_results)
+        except requests.RequestException as e:
+            print(f"Warning: batch add failed ({e}), using per-workspace adds")
+            batch_results = None
+
+    # The adds are network-latency bound; fan out concurrently. Prefer the
+    # single-event-loop httpx path (pooled, HTTP/2-capable connections) and
+    # fall back to the thread pool when httpx isn't installed.
+    if batch_results is not None:
+        for ws, result in zip(target_workspaces, batch_results):
+            print(f"Workspace: {ws['name']} -> {'OK' if result else 'FAILED'}")
+            if result:
+                _record_completed_add(completed_adds, ws['id'], user_email)
+                success_count += 1
+            else:
+                fail_count += 1
+    elif httpx is not None and len(target_workspaces) > 1:
+        results = add_users_async(access_token, target_workspaces, user_email,
+                                  access_right, existing_users_map)
+        for ws, result in zip(target_workspaces, results):
+            if isinstance(result, Exception):
+                print(f"✗ Error in workspace '{ws['name']}': {result}")
+                result = False
+            print(f"Workspace: {ws['name']} -> {'OK' if result else 'FAILED'}")
+            if result:
+                _record_completed_add(completed_adds, ws['id'], user_email)
+                success_count += 1
+            else:
+                fail_count += 1
+    else:
+        with ThreadPoolExecutor(max_workers=MAX_ADD_WORKERS) as executor:
+            futures = {
+                executor.submit(add_user_to_workspace, access_token, ws['id'], user_email, access_right,
+                                existing_users=existing_users_map.get(ws['id'])): ws
+                for ws in target_workspaces
+            }
+
+            for future in as_completed(futures):
+                ws = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    with _PRINT_LOCK:
+                        print(f"✗ Error in workspace '{ws['name']}': {e}")
+                    success = False
+
+                with _PRINT_LOCK:
+                    print(f"Workspace: {ws['name']} -> {'OK' if success else 'FAILED'}")
+
+                if success:
+                    _record_completed_add(completed_adds, ws['id'], user_email)
+                    success_count += 1
+                else:
+                    fail_count += 1
     
     # Summary
     print(f"\n{'='*60}")
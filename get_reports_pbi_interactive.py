@@ -1,457 +1,737 @@
-"""
-Script to identify custom visuals in Power BI reports - User Authentication Version
-
-Uses Device Code Flow for interactive user authentication (no password needed).
-"""
-
-import requests
-import json
-import time
-import zipfile
-import io
-import csv
-import os
-from datetime import datetime
-from msal import PublicClientApplication
-from typing import List, Dict, Optional
-
-# Configuration
-CLIENT_ID = "client-id"  # Azure CLI Public Client ID (Microsoft-owned)
-TENANT_ID = "tenant-id"  # Your Tenant ID
-AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
-SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
-PBI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
-
-
-def get_access_token_interactive() -> Optional[str]:
-    """
-    Authenticate using Device Code Flow (user interactive).
-    User will see a code to enter at microsoft.com/devicelogin
-    """
-    app = PublicClientApplication(
-        CLIENT_ID,
-        authority=AUTHORITY
-    )
-    
-    # Try to get token from cache first
-    accounts = app.get_accounts()
-    if accounts:
-        print("Found cached authentication, attempting silent login...")
-        result = app.acquire_token_silent(SCOPE, account=accounts[0])
-        if result and "access_token" in result:
-            print("OK Authentication successful (cached)")
-            return result["access_token"]
-    
-    # If no cache, use device flow
-    flow = app.initiate_device_flow(scopes=SCOPE)
-    
-    if "user_code" not in flow:
-        print(f"ERROR Failed to create device flow: {flow.get('error_description')}")
-        return None
-    
-    print("\n" + "="*60)
-    print("AUTHENTICATION REQUIRED")
-    print("="*60)
-    print(flow["message"])
-    print("="*60 + "\n")
-    
-    # Wait for user to authenticate
-    result = app.acquire_token_by_device_flow(flow)
-    
-    if "access_token" in result:
-        print("OK Authentication successful!")
-        return result["access_token"]
-    else:
-        print(f"ERROR Authentication failed")
-        print(f"Error: {result.get('error')}")
-        print(f"Error description: {result.get('error_description')}")
-        return None
-
-
-def get_workspaces(access_token: str, use_admin_api: bool = True, exclude_personal: bool = True,
-                   capacity_ids: List[str] = None) -> List[Dict]:
-    """Get all workspaces. Use admin API to get ALL workspaces in tenant."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
-    if use_admin_api:
-        # Admin API returns ALL workspaces in the tenant
-        url = f"{PBI_API_BASE}/admin/groups?$top=5000"
-    else:
-        # Regular API only returns workspaces user has access to
-        url = f"{PBI_API_BASE}/groups"
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    workspaces = response.json().get("value", [])
-    
-    # Filter out personal workspaces if requested
-    if exclude_personal:
-        workspaces = [ws for ws in workspaces if ws.get("type") != "PersonalGroup"]
-    
-    # Filter by capacity IDs if provided
-    if capacity_ids:
-        capacity_ids_lower = [c.lower() for c in capacity_ids]
-        workspaces = [ws for ws in workspaces if ws.get("capacityId", "").lower() in capacity_ids_lower]
-    
-    return workspaces
-
-
-def get_reports_in_workspace(access_token: str, workspace_id: str) -> List[Dict]:
-    """Get all reports in a specific workspace."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports"
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    return response.json().get("value", [])
-
-
-def get_report_pages(access_token: str, workspace_id: str, report_id: str) -> List[Dict]:
-    """Get pages in a report."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/pages"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("value", [])
-    except:
-        return []
-
-
-def export_report_as_pbix(access_token: str, workspace_id: str, report_id: str) -> Optional[bytes]:
-    """
-    Export report as PBIX file.
-    Returns bytes of the PBIX file if successful.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Export"
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=60)
-        if response.status_code == 200:
-            return response.content
-        else:
-            error_msg = response.text
-            if "ExportData_DisabledForModelWithDirectLakeMode" in error_msg:
-                return None  # DirectLake restriction
-            return None
-    except Exception as e:
-        return None
-
-
-def extract_visuals_from_pbix(pbix_content: bytes) -> List[Dict]:
-    """
-    Extract visual information from PBIX file.
-    PBIX is a ZIP archive containing JSON files with report metadata.
-    """
-    visuals = []
-    
-    try:
-        with zipfile.ZipFile(io.BytesIO(pbix_content)) as zip_file:
-            # Look for Layout files which contain visual definitions
-            for file_name in zip_file.namelist():
-                if "Layout" in file_name and not file_name.endswith("/"):
-                    print(f"    Found layout file: {file_name}")
-                    
-                    try:
-                        # PBIX files typically use UTF-16 LE encoding
-                        layout_content = zip_file.read(file_name).decode('utf-16-le')
-                        layout_data = json.loads(layout_content)
-                        
-                        # Parse sections and visual containers
-                        if "sections" in layout_data:
-                            for section in layout_data["sections"]:
-                                section_name = section.get("displayName", "Unnamed Section")
-                                
-                                if "visualContainers" in section:
-                                    for container in section["visualContainers"]:
-                                        if "config" in container:
-                                            config_str = container["config"]
-                                            config = json.loads(config_str)
-                                            
-                                            # Extract visual type
-                                            visual_type = config.get("singleVisual", {}).get("visualType", "Unknown")
-                                            
-                                            visual_info = {
-                                                "name": config.get("name", "Unnamed"),
-                                                "type": visual_type,
-                                                "is_custom": is_custom_visual(visual_type),
-                                                "page": section_name
-                                            }
-                                            
-                                            visuals.append(visual_info)
-                    except UnicodeDecodeError:
-                        # Try UTF-8 if UTF-16 fails
-                        try:
-                            layout_content = zip_file.read(file_name).decode('utf-8')
-                            layout_data = json.loads(layout_content)
-                            
-                            if "sections" in layout_data:
-                                for section in layout_data["sections"]:
-                                    section_name = section.get("displayName", "Unnamed Section")
-                                    
-                                    if "visualContainers" in section:
-                                        for container in section["visualContainers"]:
-                                            if "config" in container:
-                                                config_str = container["config"]
-                                                config = json.loads(config_str)
-                                                
-                                                visual_type = config.get("singleVisual", {}).get("visualType", "Unknown")
-                                                
-                                                visual_info = {
-                                                    "name": config.get("name", "Unnamed"),
-                                                    "type": visual_type,
-                                                    "is_custom": is_custom_visual(visual_type),
-                                                    "page": section_name
-                                                }
-                                                
-                                                visuals.append(visual_info)
-                        except Exception as e2:
-                            print(f"    Error decoding layout: {e2}")
-    except Exception as e:
-        print(f"  Error extracting visuals from PBIX: {e}")
-    
-    return visuals
-
-
-def is_custom_visual(visual_type: str) -> bool:
-    """
-    Determine if a visual type is a custom visual.
-    Built-in visuals have simple names like 'clusteredBarChart', 'lineChart', etc.
-    Custom visuals typically have longer names with dots or special patterns.
-    """
-    # List of known built-in visual types
-    builtin_visuals = {
-        'clusteredBarChart', 'clusteredColumnChart', 'hundredPercentStackedBarChart',
-        'hundredPercentStackedColumnChart', 'lineChart', 'areaChart', 'stackedAreaChart',
-        'lineStackedColumnComboChart', 'lineClusteredColumnComboChart', 'ribbonChart',
-        'waterfallChart', 'funnelChart', 'scatterChart', 'pieChart', 'donutChart',
-        'gauge', 'card', 'multiRowCard', 'kpi', 'slicer', 'table', 'matrix',
-        'filledMap', 'map', 'shape', 'image', 'textbox', 'treemap', 'basicShape',
-        'actionButton', 'columnChart', 'barChart', 'pivotTable'
-    }
-    
-    # If it's in the built-in list, it's not custom
-    if visual_type.lower() in builtin_visuals:
-        return False
-    
-    # Custom visuals often have:
-    # - Dots in the name (e.g., 'PBI_CV_xxxxxxxx' or 'organization.visualName')
-    # - Very long names (>25 chars)
-    # - Special prefixes like 'PBI_CV_'
-    if '.' in visual_type or len(visual_type) > 25 or visual_type.startswith('PBI_CV_'):
-        return True
-    
-    return False
-
-
-def analyze_workspace_reports(access_token: str, workspace_id: str, workspace_name: str, capacity_id: str = "",
-                               csv_filename: str = None, fieldnames: List[str] = None) -> List[Dict]:
-    """Analyze all reports in a workspace. Returns list of analysis results."""
-    print(f"\n{'='*64}")
-    print(f"{'='*16}                                                Analyzing workspace: {workspace_name}")
-    print(f"{'='*64}")
-    print(f"{'='*16}                                                ", end="")
-    
-    # Get reports
-    reports = get_reports_in_workspace(access_token, workspace_id)
-    print(f"Found {len(reports)} reports\n")
-    
-    results = []
-    
-    for report in reports:
-        report_name = report.get("name", "Unnamed Report")
-        report_id = report.get("id")
-        web_url = report.get("webUrl", "")
-        
-        print(f"\n{'-'*64}")
-        print(f"{'-'*16}                                                Report: {report_name}")
-        print(f"Report ID: {report_id}")
-        
-        # Initialize result record
-        result = {
-            "workspace": workspace_name,
-            "workspace_id": workspace_id,
-            "capacity_id": capacity_id,
-            "report": report_name,
-            "report_id": report_id,
-            "method": "Failed",
-            "num_pages": 0,
-            "is_directlake": "Unknown",
-            "total_visuals": 0,
-            "custom_visuals": 0
-        }
-        
-        # Try to export and analyze PBIX
-        print(f"  Attempting PBIX export...")
-        pbix_content = export_report_as_pbix(access_token, workspace_id, report_id)
-        
-        if pbix_content:
-            print(f"  Extracting visuals from PBIX...")
-            
-            # Save PBIX for debugging
-            filename = f"report_{report_id[:8]}.pbix"
-            with open(filename, 'wb') as f:
-                f.write(pbix_content)
-            print(f"  Saved PBIX: {filename}")
-            
-            # Extract visuals
-            visuals = extract_visuals_from_pbix(pbix_content)
-            
-            # Delete PBIX after analysis
-            try:
-                os.remove(filename)
-                print(f"  Deleted PBIX: {filename}")
-            except Exception as e:
-                print(f"  Warning: Could not delete PBIX: {e}")
-            
-            if visuals:
-                print(f"  Total visuals found: {len(visuals)}")
-                
-                # Group by page
-                pages = {}
-                for visual in visuals:
-                    page = visual["page"]
-                    if page not in pages:
-                        pages[page] = []
-                    pages[page].append(visual)
-                
-                print(f"\n  Report structure:")
-                for page_name, page_visuals in pages.items():
-                    print(f"    Page '{page_name}': {len(page_visuals)} visuals")
-                
-                # Check for custom visuals
-                custom_visuals = [v for v in visuals if v["is_custom"]]
-                
-                # Update result
-                result["method"] = "Direct Export"
-                result["total_visuals"] = len(visuals)
-                result["custom_visuals"] = len(custom_visuals)
-                result["is_directlake"] = "No"
-                result["num_pages"] = len(pages)
-                
-                if custom_visuals:
-                    print(f"\n  CUSTOM VISUALS DETECTED ({len(custom_visuals)}):")
-                    for cv in custom_visuals:
-                        print(f"    - Type: {cv['type']}")
-                        print(f"      Page: {cv['page']}")
-                        print(f"      Name: {cv['name']}")
-                else:
-                    print(f"\n  No custom visuals detected")
-            else:
-                print(f"  WARNING: Could not extract visual information from PBIX")
-                result["method"] = "Direct Export (No Visuals)"
-                result["is_directlake"] = "No"
-        else:
-            print(f"  Export failed (likely DirectLake restriction)")
-            result["is_directlake"] = "Yes"
-            
-            # Try to at least get page info
-            pages = get_report_pages(access_token, workspace_id, report_id)
-            if pages:
-                print(f"  Report has {len(pages)} page(s):")
-                for page in pages:
-                    print(f"    - {page.get('displayName', page.get('name', 'Unnamed'))}")
-                
-                result["method"] = "Page Listing Only"
-                result["num_pages"] = len(pages)
-            else:
-                result["method"] = "Failed"
-            
-            print(f"\n  NOTE: Cannot extract visual details via API")
-        
-        print(f"  LINK: {web_url}")
-        results.append(result)
-        
-        # Write to CSV immediately after each report
-        if csv_filename and fieldnames:
-            with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writerow(result)
-            print(f"  [Saved to CSV]")
-    
-    return results
-
-
-def main():
-    print("Power BI Custom Visual Identifier - Interactive User Auth")
-    print("="*60)
-    print()
-    
-    # Authenticate
-    print("Authenticating with user credentials...")
-    access_token = get_access_token_interactive()
-    
-    if not access_token:
-        print("ERROR: Failed to authenticate")
-        return
-    
-    # Create CSV file FIRST before any API calls
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"pbi_custom_visuals_report_{timestamp}.csv"
-    fieldnames = ['workspace', 'workspace_id', 'capacity_id', 'report', 'report_id', 'method', 'num_pages', 
-                  'is_directlake', 'total_visuals', 'custom_visuals']
-    
-    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-    
-    print(f"CSV file created: {csv_filename}")
-    print("Results will be saved progressively...\n")
-    
-    # Ask for capacity filter
-    print("Filter by Capacity ID?")
-    print("  - Enter capacity IDs separated by comma")
-    print("  - Or press Enter to show all workspaces")
-    capacity_input = input("Capacity IDs: ").strip()
-    
-    capacity_ids = None
-    if capacity_input:
-        capacity_ids = [c.strip() for c in capacity_input.split(",") if c.strip()]
-        print(f"Filtering by {len(capacity_ids)} capacity ID(s)")
-    
-    # Get workspaces
-    print("\nFetching workspaces...")
-    try:
-        workspaces = get_workspaces(access_token, capacity_ids=capacity_ids)
-        print(f"Found {len(workspaces)} workspaces\n")
-    except Exception as e:
-        print(f"ERROR fetching workspaces: {e}")
-        print("Check if you have Fabric Administrator permissions")
-        return
-    
-    # Collect all results
-    all_results = []
-    
-    # Analyze each workspace
-    for workspace in workspaces:
-        workspace_name = workspace.get("name", "Unnamed Workspace")
-        workspace_id = workspace.get("id")
-        capacity_id = workspace.get("capacityId", "")
-        
-        results = analyze_workspace_reports(access_token, workspace_id, workspace_name, capacity_id,
-                                            csv_filename=csv_filename, fieldnames=fieldnames)
-        all_results.extend(results)
-    
-    # Summary
-    print(f"\n{'='*60}")
-    total_reports = len(all_results)
-    reports_with_custom = sum(1 for r in all_results if r['custom_visuals'] > 0)
-    directlake_reports = sum(1 for r in all_results if r['is_directlake'] == 'Yes')
-    successful_exports = sum(1 for r in all_results if 'Export' in r['method'])
-    
-    print(f"\nCSV report generated: {csv_filename}")
-    print(f"{'='*60}")
-    print(f"SUMMARY:")
-    print(f"  Total reports analyzed: {total_reports}")
-    print(f"  Reports with custom visuals: {reports_with_custom}")
-    print(f"  DirectLake reports: {directlake_reports}")
-    print(f"  Successful PBIX exports: {successful_exports}")
-    print(f"{'='*60}\n")
-
-
-if __name__ == "__main__":
-    main()
+"""
+Script to identify custom visuals in Power BI reports - User Authentication Version
+
+Uses Device Code Flow for interactive user authentication (no password needed).
+"""
+
+import atexit
+import logging
+import requests
+import json
+import re
+import shutil
+import sys
+import time
+import threading
+import zipfile
+import io
+import csv
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from msal import PublicClientApplication, SerializableTokenCache
+from typing import List, Dict, Optional
+
+try:
+    import orjson  # optional: much faster parse of large Layout documents
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data):
+    """Parse JSON (str or bytes) with orjson when available, stdlib otherwise."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Configuration
+CLIENT_ID = "client-id"  # Azure CLI Public Client ID (Microsoft-owned)
+TENANT_ID = "tenant-id"  # Your Tenant ID
+AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
+PBI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
+TOKEN_CACHE_PATH = os.path.expanduser("~/.pbi_token_cache.bin")
+
+# Shared HTTP session: keep-alive avoids a TLS handshake per call, and the
+# mounted Retry transparently backs off on 429/5xx (honoring Retry-After),
+# so one throttled response no longer kills a whole tenant scan.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    # Pool sized above the worker count so concurrent report/workspace
+    # requests reuse warm connections instead of opening new ones.
+    pool_connections=64,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        respect_retry_after_header=True
+    )
+))
+
+# Keep downloaded PBIX files after analysis (debugging aid). The download
+# itself is the only disk write; by default it's removed once parsed.
+KEEP_PBIX = False
+
+# Per-report chatter (~15 lines per report) goes through a buffered logger
+# instead of print(): with thousands of reports, unbuffered stdout writes
+# become a measurable share of the critical path. Detail is opt-in via
+# PBI_SCAN_VERBOSE=1; warnings and the scan summary always show.
+VERBOSE = os.environ.get("PBI_SCAN_VERBOSE", "").lower() in ("1", "true", "yes")
+
+class _FlushOnWarningHandler(logging.StreamHandler):
+    """Buffered for INFO chatter, but warnings and errors flush straight
+    through so problems surface while the scan is still running.
+
+    The base emit() flushes after every record, which would defeat the
+    block-buffered stream entirely — so emit is reimplemented to write
+    without flushing and only flush at WARNING and above.
+    """
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+log = logging.getLogger(__name__)
+_LOG_STREAM = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8",
+                               line_buffering=False, write_through=False)
+_log_handler = _FlushOnWarningHandler(_LOG_STREAM)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+log.addHandler(_log_handler)
+log.setLevel(logging.INFO if VERBOSE else logging.WARNING)
+log.propagate = False
+atexit.register(_LOG_STREAM.flush)
+
+# Workspaces analyzed concurrently. The scan is dominated by HTTP latency
+# (exports especially), so overlapping workspaces cuts wall time roughly
+# by the worker count until Power BI throttling kicks in.
+MAX_WORKSPACE_WORKERS = 8
+
+# Power BI allows only a handful of simultaneous PBIX exports per user
+# before it starts failing them outright, so exports are gated separately
+# from the workspace workers: at most this many /Export calls in flight,
+# while the remaining workers keep listing pages and parsing layouts.
+MAX_CONCURRENT_EXPORTS = 4
+_EXPORT_SEMAPHORE = threading.BoundedSemaphore(MAX_CONCURRENT_EXPORTS)
+
+# Guards the shared CSV file across workspace worker threads
+_CSV_LOCK = threading.Lock()
+
+# CSV column order. Every result dict carries exactly these keys, so rows
+# are written with a plain csv.writer (no per-row fieldname mapping).
+ROW_KEYS = ('workspace', 'workspace_id', 'capacity_id', 'report', 'report_id',
+            'method', 'num_pages', 'is_directlake', 'total_visuals', 'custom_visuals')
+
+# PBIX parsing (zip inflate + JSON decode) is CPU-bound; running it in a
+# process pool keeps the worker threads free to drive network I/O and lets
+# large layouts parse on all cores. main() creates it before the worker
+# threads spin up — forking while 8 threads hold session/logging locks can
+# deadlock the children on Linux's default fork start method.
+_EXTRACT_POOL = None
+_EXTRACT_POOL_LOCK = threading.Lock()
+
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is None:
+            _EXTRACT_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _EXTRACT_POOL
+
+
+def _load_token_cache() -> SerializableTokenCache:
+    """
+    Load the MSAL token cache from disk (if present) and register a save
+    hook at exit. The persisted refresh token lets acquire_token_silent
+    succeed on later runs, skipping the device-code flow — which also makes
+    scheduled/unattended scans possible.
+    """
+    cache = SerializableTokenCache()
+
+    if os.path.exists(TOKEN_CACHE_PATH):
+        with open(TOKEN_CACHE_PATH) as f:
+            cache.deserialize(f.read())
+
+    def _save_cache():
+        if cache.has_state_changed:
+            with open(TOKEN_CACHE_PATH, "w") as f:
+                f.write(cache.serialize())
+            os.chmod(TOKEN_CACHE_PATH, 0o600)  # cache holds refresh tokens
+
+    atexit.register(_save_cache)
+    return cache
+
+
+def get_access_token_interactive() -> Optional[str]:
+    """
+    Authenticate using Device Code Flow (user interactive).
+    User will see a code to enter at microsoft.com/devicelogin
+    """
+    app = PublicClientApplication(
+        CLIENT_ID,
+        authority=AUTHORITY,
+        token_cache=_load_token_cache()
+    )
+
+    # Try to get token from cache first
+    accounts = app.get_accounts()
+    if accounts:
+        print("Found cached authentication, attempting silent login...")
+        result = app.acquire_token_silent(SCOPE, account=accounts[0])
+        if result and "access_token" in result:
+            print("OK Authentication successful (cached)")
+            return result["access_token"]
+    
+    # If no cache, use device flow
+    flow = app.initiate_device_flow(scopes=SCOPE)
+    
+    if "user_code" not in flow:
+        print(f"ERROR Failed to create device flow: {flow.get('error_description')}")
+        return None
+    
+    print("\n" + "="*60)
+    print("AUTHENTICATION REQUIRED")
+    print("="*60)
+    print(flow["message"])
+    print("="*60 + "\n")
+    
+    # Wait for user to authenticate
+    result = app.acquire_token_by_device_flow(flow)
+    
+    if "access_token" in result:
+        print("OK Authentication successful!")
+        return result["access_token"]
+    else:
+        print(f"ERROR Authentication failed")
+        print(f"Error: {result.get('error')}")
+        print(f"Error description: {result.get('error_description')}")
+        return None
+
+
+def get_workspaces(access_token: str, use_admin_api: bool = True, exclude_personal: bool = True,
+                   capacity_ids: List[str] = None, page_size: int = 5000) -> List[Dict]:
+    """Get all workspaces. Use admin API to get ALL workspaces in tenant."""
+    if use_admin_api:
+        # Admin API returns ALL workspaces in the tenant, capped at $top per
+        # response — page with $skip until a short page comes back so
+        # tenants beyond page_size workspaces aren't silently truncated.
+        workspaces = []
+        skip = 0
+        while True:
+            url = f"{PBI_API_BASE}/admin/groups?$top={page_size}&$skip={skip}"
+            response = _SESSION.get(url)
+            response.raise_for_status()
+
+            value = response.json().get("value", [])
+            workspaces.extend(value)
+
+            if len(value) < page_size:
+                break
+            skip += page_size
+    else:
+        # Regular API only returns workspaces user has access to
+        url = f"{PBI_API_BASE}/groups"
+        response = _SESSION.get(url)
+        response.raise_for_status()
+
+        workspaces = response.json().get("value", [])
+    
+    # Filter out personal workspaces if requested
+    if exclude_personal:
+        workspaces = [ws for ws in workspaces if ws.get("type") != "PersonalGroup"]
+    
+    # Filter by capacity IDs if provided
+    if capacity_ids:
+        capacity_ids_lower = [c.lower() for c in capacity_ids]
+        workspaces = [ws for ws in workspaces if ws.get("capacityId", "").lower() in capacity_ids_lower]
+    
+    return workspaces
+
+
+def get_reports_in_workspace(access_token: str, workspace_id: str) -> List[Dict]:
+    """Get all reports in a specific workspace."""
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports"
+    
+    response = _SESSION.get(url)
+    response.raise_for_status()
+    
+    return response.json().get("value", [])
+
+
+def get_all_reports_by_workspace(access_token: str, page_size: int = 5000) -> Optional[Dict[str, List[Dict]]]:
+    """
+    Fetch every report in the tenant via the admin reports endpoint (one
+    paginated call) and group them by workspaceId. Replaces N per-workspace
+    report listings with ~1 request. Returns None when the endpoint isn't
+    available so callers can fall back to per-workspace listing.
+    """
+    reports_by_workspace = {}
+    skip = 0
+
+    try:
+        while True:
+            url = f"{PBI_API_BASE}/admin/reports?$top={page_size}&$skip={skip}"
+            response = _SESSION.get(url)
+            response.raise_for_status()
+
+            value = response.json().get("value", [])
+            for report in value:
+                reports_by_workspace.setdefault(report.get("workspaceId"), []).append(report)
+
+            if len(value) < page_size:
+                break
+            skip += page_size
+    except requests.RequestException as e:
+        log.warning(f"Admin reports listing unavailable ({e}), using per-workspace listing")
+        return None
+
+    return reports_by_workspace
+
+
+def get_directlake_dataset_ids(access_token: str, page_size: int = 5000) -> Optional[set]:
+    """
+    Fetch the tenant's datasets via the admin API and return the ids of the
+    DirectLake ones. Reports bound to these can never be exported as PBIX
+    (ExportData_DisabledForModelWithDirectLakeMode), so knowing them up
+    front skips the doomed export attempt entirely. Returns None when the
+    endpoint isn't available so callers fall back to detect-on-failure.
+    """
+    directlake_ids = set()
+    skip = 0
+
+    try:
+        while True:
+            url = f"{PBI_API_BASE}/admin/datasets?$top={page_size}&$skip={skip}"
+            response = _SESSION.get(url)
+            response.raise_for_status()
+
+            value = response.json().get("value", [])
+            directlake_ids.update(d["id"] for d in value
+                                  if d.get("targetStorageMode") == "DirectLake")
+
+            if len(value) < page_size:
+                break
+            skip += page_size
+    except requests.RequestException as e:
+        log.warning(f"Admin datasets listing unavailable ({e}), DirectLake detected on export failure")
+        return None
+
+    return directlake_ids
+
+
+def get_report_pages(access_token: str, workspace_id: str, report_id: str) -> List[Dict]:
+    """Get pages in a report."""
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/pages"
+    
+    try:
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        return response.json().get("value", [])
+    except:
+        return []
+
+
+def export_report_as_pbix(access_token: str, workspace_id: str, report_id: str) -> Optional[str]:
+    """
+    Export report as PBIX file, streaming the response straight to disk so
+    the archive (potentially 100+ MB) is never held in memory.
+    Returns the path of the downloaded file if successful.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Export"
+    pbix_path = f"report_{report_id[:8]}.pbix"
+
+    try:
+        # Gate concurrent exports: a short connect timeout catches a dead
+        # service quickly, while the generous read timeout lets large
+        # archives finish streaming instead of dying at a flat 60s.
+        with _EXPORT_SEMAPHORE:
+            with _SESSION.get(url, timeout=(10, 300), stream=True) as response:
+                if response.status_code != 200:
+                    # Includes the DirectLake restriction
+                    # (ExportData_DisabledForModelWithDirectLakeMode)
+                    return None
+                with open(pbix_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f)
+        return pbix_path
+    except Exception:
+        try:
+            os.remove(pbix_path)
+        except OSError:
+            pass
+        return None
+
+
+# Matches a "...Layout" entry name (not a directory) in one C-level pass,
+# replacing the substring + endswith pair in the namelist fallback scan
+_LAYOUT_RE = re.compile(r"Layout[^/]*$")
+
+
+def extract_visuals_from_pbix(pbix_path: str) -> List[Dict]:
+    """
+    Extract visual information from a PBIX file on disk.
+    PBIX is a ZIP archive containing JSON files with report metadata;
+    opening it in place means only the central directory and the Layout
+    entry are read — the rest of the archive stays on disk.
+    """
+    visuals = []
+
+    try:
+        with zipfile.ZipFile(pbix_path) as zip_file:
+            # The Layout entry lives at a canonical path in PBIX archives;
+            # read it directly instead of scanning the whole name list, and
+            # only fall back to the scan for nonstandard archives.
+            try:
+                file_name = "Report/Layout"
+                layout_bytes = zip_file.read(file_name)
+            except KeyError:
+                file_name = next((n for n in zip_file.namelist()
+                                  if _LAYOUT_RE.search(n)), None)
+                layout_bytes = zip_file.read(file_name) if file_name else None
+
+            if layout_bytes is not None:
+                log.info(f"    Found layout file: {file_name}")
+                try:
+                    visuals = _parse_layout(layout_bytes)
+                except Exception as e2:
+                    log.warning(f"    Error decoding layout: {e2}")
+    except Exception as e:
+        log.warning(f"  Error extracting visuals from PBIX: {e}")
+
+    return visuals
+
+
+def _parse_layout(layout_bytes: bytes) -> List[Dict]:
+    """
+    Decode and walk a PBIX Layout document, returning one dict per visual.
+    Encoding is detected once from the BOM (PBIX layouts are UTF-16 LE as a
+    rule, UTF-8 in rare repackaged files) so the section traversal exists
+    exactly once instead of per-encoding copies.
+    """
+    if layout_bytes[:2] == b'\xff\xfe':
+        # 'utf-16' consumes the BOM; 'utf-16-le' would keep it as a leading
+        # U+FEFF that the JSON parsers reject
+        layout_content = layout_bytes.decode('utf-16')
+    elif layout_bytes[:3] == b'\xef\xbb\xbf':
+        layout_content = layout_bytes.decode('utf-8-sig')
+    else:
+        try:
+            layout_content = layout_bytes.decode('utf-16-le')
+        except UnicodeDecodeError:
+            layout_content = layout_bytes.decode('utf-8', errors='replace')
+
+    layout_data = _json_loads(layout_content)
+    visuals = []
+
+    # Parse sections and visual containers
+    for section in layout_data.get("sections", []):
+        section_name = section.get("displayName", "Unnamed Section")
+
+        for container in section.get("visualContainers", []):
+            config_str = container.get("config")
+            if config_str is None:
+                continue
+            # config is double-encoded (a JSON string inside the Layout
+            # JSON) and parsed once per visual — the hottest parse in the
+            # scan, so it goes through orjson when installed
+            config = _json_loads(config_str)
+
+            # Extract visual type
+            visual_type = config.get("singleVisual", {}).get("visualType", "Unknown")
+
+            visuals.append({
+                "name": config.get("name", "Unnamed"),
+                "type": visual_type,
+                "is_custom": is_custom_visual(visual_type),
+                "page": section_name
+            })
+
+    return visuals
+
+
+# Known built-in visual types, lowercased once at import so is_custom_visual
+# doesn't rebuild (and re-lowercase) the set for every visual it classifies
+_BUILTIN_VISUALS = frozenset(v.lower() for v in (
+    'clusteredBarChart', 'clusteredColumnChart', 'hundredPercentStackedBarChart',
+    'hundredPercentStackedColumnChart', 'lineChart', 'areaChart', 'stackedAreaChart',
+    'lineStackedColumnComboChart', 'lineClusteredColumnComboChart', 'ribbonChart',
+    'waterfallChart', 'funnelChart', 'scatterChart', 'pieChart', 'donutChart',
+    'gauge', 'card', 'multiRowCard', 'kpi', 'slicer', 'table', 'matrix',
+    'filledMap', 'map', 'shape', 'image', 'textbox', 'treemap', 'basicShape',
+    'actionButton', 'columnChart', 'barChart', 'pivotTable'
+))
+
+
+def is_custom_visual(visual_type: str) -> bool:
+    """
+    Determine if a visual type is a custom visual.
+    Built-in visuals have simple names like 'clusteredBarChart', 'lineChart', etc.
+    Custom visuals typically have longer names with dots or special patterns.
+    """
+    # Built-in lookup first (frozenset, O(1)), then the heuristics — dots
+    # (e.g. 'organization.visualName'), very long names (>25 chars), or the
+    # 'PBI_CV_' marketplace prefix — as one short-circuiting expression.
+    return (visual_type.lower() not in _BUILTIN_VISUALS
+            and ('.' in visual_type
+                 or len(visual_type) > 25
+                 or visual_type.startswith('PBI_CV_')))
+
+
+def analyze_workspace_reports(access_token: str, workspace_id: str, workspace_name: str, capacity_id: str = "",
+                               csv_writer=None, csv_file=None,
+                               reports: List[Dict] = None,
+                               directlake_datasets: set = None) -> List[Dict]:
+    """
+    Analyze all reports in a workspace. Returns list of analysis results.
+    Pass reports (from get_all_reports_by_workspace) to skip the
+    per-workspace listing round trip, and directlake_datasets (from
+    get_directlake_dataset_ids) to skip export attempts that the service
+    would reject anyway.
+    """
+    log.info(f"\n{'='*64}")
+    log.info(f"{'='*16}                                                Analyzing workspace: {workspace_name}")
+    log.info(f"{'='*64}")
+
+    # Get reports (unless prefetched tenant-wide)
+    if reports is None:
+        reports = get_reports_in_workspace(access_token, workspace_id)
+    log.info(f"Found {len(reports)} reports\n")
+    
+    results = []
+    
+    for report in reports:
+        report_name = report.get("name", "Unnamed Report")
+        report_id = report.get("id")
+        web_url = report.get("webUrl", "")
+        
+        log.info(f"\n{'-'*64}")
+        log.info(f"{'-'*16}                                                Report: {report_name}")
+        log.info(f"Report ID: {report_id}")
+        
+        # Initialize result record
+        result = {
+            "workspace": workspace_name,
+            "workspace_id": workspace_id,
+            "capacity_id": capacity_id,
+            "report": report_name,
+            "report_id": report_id,
+            "method": "Failed",
+            "num_pages": 0,
+            "is_directlake": "Unknown",
+            "total_visuals": 0,
+            "custom_visuals": 0
+        }
+        
+        # Don't bother exporting when the bound dataset is known DirectLake;
+        # the service refuses those after a long wait, so fall straight
+        # through to the page-listing path.
+        known_directlake = (directlake_datasets is not None
+                            and report.get("datasetId") in directlake_datasets)
+
+        if known_directlake:
+            log.info("  Skipping export (DirectLake dataset)")
+            pbix_path = None
+        else:
+            # Try to export and analyze PBIX
+            log.info("  Attempting PBIX export...")
+            pbix_path = export_report_as_pbix(access_token, workspace_id, report_id)
+
+        if pbix_path:
+            log.info("  Extracting visuals from PBIX...")
+
+            # Extract visuals straight from the downloaded file, offloaded
+            # to the process pool so parsing doesn't block this thread
+            visuals = _get_extract_pool().submit(extract_visuals_from_pbix, pbix_path).result()
+
+            # The downloaded file was only needed for parsing; keep it only
+            # when explicitly debugging
+            if KEEP_PBIX:
+                log.info(f"  Kept PBIX: {pbix_path}")
+            else:
+                try:
+                    os.remove(pbix_path)
+                except Exception as e:
+                    log.warning(f"  Warning: Could not delete PBIX: {e}")
+            
+            if visuals:
+                log.info(f"  Total visuals found: {len(visuals)}")
+                
+                # Group by page and pick out custom visuals in one pass
+                pages = defaultdict(list)
+                custom_visuals = []
+                for visual in visuals:
+                    pages[visual["page"]].append(visual)
+                    if visual["is_custom"]:
+                        custom_visuals.append(visual)
+
+                log.info("\n  Report structure:")
+                for page_name, page_visuals in pages.items():
+                    log.info(f"    Page '{page_name}': {len(page_visuals)} visuals")
+                
+                # Update result
+                result["method"] = "Direct Export"
+                result["total_visuals"] = len(visuals)
+                result["custom_visuals"] = len(custom_visuals)
+                result["is_directlake"] = "No"
+                result["num_pages"] = len(pages)
+                
+                if custom_visuals:
+                    log.info(f"\n  CUSTOM VISUALS DETECTED ({len(custom_visuals)}):")
+                    for cv in custom_visuals:
+                        log.info(f"    - Type: {cv['type']}")
+                        log.info(f"      Page: {cv['page']}")
+                        log.info(f"      Name: {cv['name']}")
+                else:
+                    log.info("\n  No custom visuals detected")
+            else:
+                log.warning("  WARNING: Could not extract visual information from PBIX")
+                result["method"] = "Direct Export (No Visuals)"
+                result["is_directlake"] = "No"
+        else:
+            if known_directlake:
+                log.info("  DirectLake report (export not attempted)")
+            else:
+                log.info("  Export failed (likely DirectLake restriction)")
+            result["is_directlake"] = "Yes"
+            
+            # Try to at least get page info
+            pages = get_report_pages(access_token, workspace_id, report_id)
+            if pages:
+                log.info(f"  Report has {len(pages)} page(s):")
+                for page in pages:
+                    log.info(f"    - {page.get('displayName', page.get('name', 'Unnamed'))}")
+                
+                result["method"] = "Page Listing Only"
+                result["num_pages"] = len(pages)
+            else:
+                result["method"] = "Failed"
+            
+            log.info("\n  NOTE: Cannot extract visual details via API")
+        
+        log.info(f"  LINK: {web_url}")
+        results.append(result)
+        
+        # Write to CSV immediately after each report — one shared handle and
+        # writer for the whole scan instead of reopening the file per row
+        if csv_writer is not None:
+            with _CSV_LOCK:
+                csv_writer.writerow([result[k] for k in ROW_KEYS])
+                if csv_file is not None:
+                    csv_file.flush()  # keep partial results durable
+            log.info("  [Saved to CSV]")
+    
+    return results
+
+
+def main():
+    print("Power BI Custom Visual Identifier - Interactive User Auth")
+    print("="*60)
+    print()
+    
+    # Authenticate
+    print("Authenticating with user credentials...")
+    access_token = get_access_token_interactive()
+    
+    if not access_token:
+        print("ERROR: Failed to authenticate")
+        return
+
+    # One bearer header on the shared session instead of a fresh dict per
+    # API call; every helper below rides on the session default.
+    _SESSION.headers["Authorization"] = f"Bearer {access_token}"
+
+
+    # Create CSV file FIRST before any API calls
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = f"pbi_custom_visuals_report_{timestamp}.csv"
+
+    # One handle + writer for the whole scan; rows are flushed as they land
+    csvfile = open(csv_filename, 'w', newline='', encoding='utf-8', buffering=8192)
+    writer = csv.writer(csvfile)
+    writer.writerow(ROW_KEYS)
+    csvfile.flush()
+
+    print(f"CSV file created: {csv_filename}")
+    print("Results will be saved progressively...\n")
+    
+    # Ask for capacity filter
+    print("Filter by Capacity ID?")
+    print("  - Enter capacity IDs separated by comma")
+    print("  - Or press Enter to show all workspaces")
+    capacity_input = input("Capacity IDs: ").strip()
+    
+    capacity_ids = None
+    if capacity_input:
+        capacity_ids = [c.strip() for c in capacity_input.split(",") if c.strip()]
+        print(f"Filtering by {len(capacity_ids)} capacity ID(s)")
+    
+    # Get workspaces
+    print("\nFetching workspaces...")
+    try:
+        workspaces = get_workspaces(access_token, capacity_ids=capacity_ids)
+        print(f"Found {len(workspaces)} workspaces\n")
+    except Exception as e:
+        print(f"ERROR fetching workspaces: {e}")
+        print("Check if you have Fabric Administrator permissions")
+        return
+    
+    # Collect all results
+    all_results = []
+
+    # One tenant-wide report listing instead of one GET per workspace
+    print("Fetching report inventory...")
+    reports_by_workspace = get_all_reports_by_workspace(access_token)
+
+    # Known-DirectLake datasets, fetched once so their reports skip the
+    # export attempt entirely
+    print("Fetching dataset storage modes...")
+    directlake_datasets = get_directlake_dataset_ids(access_token)
+
+    # Fork the extraction processes now, while this is still the only
+    # running thread (see the _EXTRACT_POOL comment)
+    extract_pool = _get_extract_pool()
+
+    # Analyze workspaces concurrently — each one is a chain of blocking API
+    # calls, so overlapping them keeps the scan network-bound, not serial.
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKSPACE_WORKERS) as executor:
+            futures = {
+                executor.submit(analyze_workspace_reports, access_token,
+                                workspace.get("id"), workspace.get("name", "Unnamed Workspace"),
+                                workspace.get("capacityId", ""),
+                                csv_writer=writer, csv_file=csvfile,
+                                reports=(None if reports_by_workspace is None
+                                         else reports_by_workspace.get(workspace.get("id"), [])),
+                                directlake_datasets=directlake_datasets): workspace
+                for workspace in workspaces
+            }
+
+            for future in as_completed(futures):
+                workspace = futures[future]
+                try:
+                    all_results.extend(future.result())
+                except Exception as e:
+                    print(f"ERROR analyzing workspace {workspace.get('name', 'Unnamed Workspace')}: {e}")
+    finally:
+        csvfile.close()
+        extract_pool.shutdown()
+
+    # Summary
+    print(f"\n{'='*60}")
+    total_reports = len(all_results)
+    reports_with_custom = sum(1 for r in all_results if r['custom_visuals'] > 0)
+    directlake_reports = sum(1 for r in all_results if r['is_directlake'] == 'Yes')
+    successful_exports = sum(1 for r in all_results if 'Export' in r['method'])
+    
+    print(f"\nCSV report generated: {csv_filename}")
+    print(f"{'='*60}")
+    print(f"SUMMARY:")
+    print(f"  Total reports analyzed: {total_reports}")
+    print(f"  Reports with custom visuals: {reports_with_custom}")
+    print(f"  DirectLake reports: {directlake_reports}")
+    print(f"  Successful PBIX exports: {successful_exports}")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    main()
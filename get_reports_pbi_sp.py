@@ -1,644 +1,892 @@
-"""
-Script to identify custom visuals in Power BI reports published in Microsoft Fabric.
-
-This script uses the Power BI Scanner API to:
-1. Authenticate with Azure AD using service principal
-2. Scan workspaces for detailed metadata
-3. Extract visual information from reports
-4. Identify custom visuals
-"""
-
-import requests
-import json
-import time
-import csv
-from datetime import datetime
-from msal import ConfidentialClientApplication
-from typing import List, Dict, Optional
-
-# Configuration
-CLIENT_ID = "client-id"  # Service Principal (App) ID
-TENANT_ID = "tenant-id"  # Tenant ID
-CLIENT_SECRET = "secret-id"  # Service Principal Secret
-AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
-SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
-PBI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
-
-
-def get_access_token(client_id: str, tenant_id: str, client_secret: str) -> Optional[str]:
-    """
-    Authenticate and get access token using service principal (client credentials flow).
-    """
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    app = ConfidentialClientApplication(
-        client_id,
-        authority=authority,
-        client_credential=client_secret
-    )
-    
-    # Acquire token using client credentials
-    result = app.acquire_token_for_client(scopes=SCOPE)
-    
-    if "access_token" in result:
-        print("OK Authentication successful with service principal")
-        return result["access_token"]
-    else:
-        print(f"ERROR Authentication failed")
-        print(f"Error: {result.get('error')}")
-        print(f"Error description: {result.get('error_description')}")
-        return None
-
-
-def get_workspaces(access_token: str) -> List[Dict]:
-    """
-    Get all workspaces accessible to the user.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups"
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    return response.json().get("value", [])
-
-
-def get_reports_in_workspace(access_token: str, workspace_id: str) -> List[Dict]:
-    """
-    Get all reports in a specific workspace.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports"
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    
-    return response.json().get("value", [])
-
-
-def clone_report(access_token: str, workspace_id: str, report_id: str, report_name: str) -> Optional[str]:
-    """
-    Clone a report to try exporting the clone (may have fewer restrictions).
-    Returns the clone ID if successful.
-    """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Clone"
-    clone_name = f"temp_analysis_{report_id[:8]}"
-    
-    body = {
-        "name": clone_name,
-        "targetWorkspaceId": workspace_id
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=body)
-        if response.status_code in [200, 201]:
-            clone_id = response.json().get("id")
-            print(f"  Cloned as: {clone_name} (ID: {clone_id})")
-            return clone_id
-        else:
-            return None
-    except:
-        return None
-
-
-def delete_report(access_token: str, workspace_id: str, report_id: str):
-    """Delete a report (cleanup clones)."""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}"
-    
-    try:
-        requests.delete(url, headers=headers)
-    except:
-        pass
-
-
-def export_report_as_pbix(access_token: str, workspace_id: str, report_id: str, is_clone: bool = False) -> Optional[bytes]:
-    """
-    Try to export/download report as PBIX file.
-    This requires specific permissions but would give us full access to visuals.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Export"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.content
-        else:
-            error_msg = response.json().get("error", {}).get("code", "Unknown")
-            if not is_clone:  # Only print error for original, not clone attempts
-                print(f"  Direct export failed: {error_msg}")
-            return None
-    except Exception as e:
-        return None
-
-
-def extract_visuals_from_pbix(pbix_content: bytes) -> List[Dict]:
-    """
-    Extract visual information from PBIX file.
-    PBIX is a ZIP archive containing JSON files with report metadata.
-    """
-    import zipfile
-    import io
-    
-    visuals = []
-    
-    try:
-        with zipfile.ZipFile(io.BytesIO(pbix_content)) as zip_file:
-            # Look for Layout files which contain visual definitions
-            for file_name in zip_file.namelist():
-                if "Layout" in file_name and not file_name.endswith("/"):
-                    print(f"    Found layout file: {file_name}")
-                    
-                    try:
-                        # PBIX files typically use UTF-16 LE encoding
-                        layout_content = zip_file.read(file_name).decode('utf-16-le')
-                        layout_data = json.loads(layout_content)
-                        
-                        # Parse sections and visual containers
-                        if "sections" in layout_data:
-                            for section in layout_data["sections"]:
-                                section_name = section.get("displayName", "Unnamed Section")
-                                
-                                if "visualContainers" in section:
-                                    for container in section["visualContainers"]:
-                                        if "config" in container:
-                                            config_str = container["config"]
-                                            config = json.loads(config_str)
-                                            
-                                            # Extract visual type
-                                            visual_type = config.get("singleVisual", {}).get("visualType", "Unknown")
-                                            
-                                            visual_info = {
-                                                "name": config.get("name", "Unnamed"),
-                                                "type": visual_type,
-                                                "is_custom": is_custom_visual(visual_type),
-                                                "page": section_name
-                                            }
-                                            
-                                            visuals.append(visual_info)
-                    except UnicodeDecodeError:
-                        # Try UTF-8 if UTF-16 fails
-                        try:
-                            layout_content = zip_file.read(file_name).decode('utf-8')
-                            layout_data = json.loads(layout_content)
-                            
-                            if "sections" in layout_data:
-                                for section in layout_data["sections"]:
-                                    section_name = section.get("displayName", "Unnamed Section")
-                                    
-                                    if "visualContainers" in section:
-                                        for container in section["visualContainers"]:
-                                            if "config" in container:
-                                                config_str = container["config"]
-                                                config = json.loads(config_str)
-                                                
-                                                visual_type = config.get("singleVisual", {}).get("visualType", "Unknown")
-                                                
-                                                visual_info = {
-                                                    "name": config.get("name", "Unnamed"),
-                                                    "type": visual_type,
-                                                    "is_custom": is_custom_visual(visual_type),
-                                                    "page": section_name
-                                                }
-                                                
-                                                visuals.append(visual_info)
-                        except Exception as e2:
-                            print(f"    Error decoding layout: {e2}")
-    except Exception as e:
-        print(f"  Error extracting visuals from PBIX: {e}")
-    
-    return visuals
-
-
-def get_report_pages(access_token: str, workspace_id: str, report_id: str) -> list:
-    """
-    Get all pages in a report using the regular API.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/pages"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("value", [])
-    except Exception as e:
-        print(f"Error getting pages: {e}")
-        return []
-
-
-def scan_workspace(access_token: str, workspace_id: str) -> Optional[str]:
-    """
-    Initiate a workspace scan using the Scanner API.
-    Returns the scan ID.
-    """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    # Use admin API endpoint
-    url = "https://api.powerbi.com/v1.0/myorg/admin/workspaces/getInfo"
-    
-    # Request body with ALL options enabled to get maximum metadata
-    # Including visual information requires "Enhance admin APIs responses with detailed metadata" in Admin Portal
-    body = {
-        "workspaces": [workspace_id],
-        "datasetExpressions": True,  # Enable to get DAX expressions
-        "datasetSchema": True,       # Enable to get dataset schema
-        "datasourceDetails": True,   # Enable to get datasource details
-        "getArtifactUsers": True,    # Enable to get user info
-        "lineage": True              # Enable to get lineage info
-    }
-    
-    print(f"📤 Request body: {json.dumps(body, indent=2)}")
-    
-    response = requests.post(url, headers=headers, json=body)
-    
-    if response.status_code == 202:
-        # Scan accepted, get scan ID from Location header
-        location = response.headers.get("Location", "")
-        scan_id = location.split("/")[-1] if location else None
-        print(f"✓ Scan accepted - Scan ID: {scan_id}")
-        return scan_id
-    else:
-        print(f"❌ Scan request failed: {response.status_code}")
-        print(f"Response: {response.text}")
-        print(f"Response headers: {dict(response.headers)}")
-        return None
-
-
-def get_scan_status(access_token: str, scan_id: str) -> Optional[str]:
-    """
-    Check the status of a workspace scan.
-    Returns 'Succeeded', 'Running', or None if failed.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanStatus/{scan_id}"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("status")
-    except Exception as e:
-        print(f"Error checking scan status: {e}")
-        return None
-
-
-def get_scan_result(access_token: str, scan_id: str) -> Optional[Dict]:
-    """
-    Get the result of a completed workspace scan.
-    """
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanResult/{scan_id}"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Error getting scan result: {e}")
-        return None
-
-
-def extract_visuals_from_scan(scan_data: Dict, debug: bool = False) -> Dict[str, List[Dict]]:
-    """
-    Extract visual information from Scanner API result.
-    Returns a dictionary mapping report IDs to their visuals.
-    """
-    report_visuals = {}
-    
-    # Save scan data for debugging if needed
-    if debug:
-        with open("scan_debug.json", "w", encoding="utf-8") as f:
-            json.dump(scan_data, f, indent=2)
-        print("📝 Scan data saved to scan_debug.json")
-    
-    try:
-        workspaces = scan_data.get("workspaces", [])
-        
-        if debug:
-            print(f"\n🔍 DEBUG: Found {len(workspaces)} workspaces in scan data")
-        
-        for workspace in workspaces:
-            reports = workspace.get("reports", [])
-            
-            if debug:
-                print(f"🔍 DEBUG: Workspace has {len(reports)} reports")
-            
-            for report in reports:
-                report_id = report.get("id")
-                report_name = report.get("name", "Unknown")
-                pages = report.get("pages", [])
-                
-                if debug:
-                    print(f"\n🔍 DEBUG: Report '{report_name}' ({report_id})")
-                    print(f"   Pages: {len(pages)}")
-                
-                all_visuals = []
-                
-                for page in pages:
-                    page_name = page.get("name", "Unnamed Page")
-                    visuals = page.get("visuals", [])
-                    
-                    if debug and visuals:
-                        print(f"   Page '{page_name}': {len(visuals)} visuals")
-                    
-                    for visual in visuals:
-                        visual_type = visual.get("visualType", "Unknown")
-                        
-                        if debug:
-                            print(f"      - Type: {visual_type}")
-                        
-                        visual_info = {
-                            "name": visual.get("name", "Unnamed"),
-                            "type": visual_type,
-                            "is_custom": is_custom_visual(visual_type),
-                            "page": page_name
-                        }
-                        
-                        all_visuals.append(visual_info)
-                
-                report_visuals[report_id] = {
-                    "name": report_name,
-                    "visuals": all_visuals
-                }
-    
-    except Exception as e:
-        print(f"Error extracting visuals from scan: {e}")
-        import traceback
-        traceback.print_exc()
-    
-    return report_visuals
-
-
-def is_custom_visual(visual_type: str) -> bool:
-    """
-    Determine if a visual type is a custom visual.
-    Built-in visuals have specific type names, custom visuals typically have longer identifiers.
-    """
-    if not visual_type or visual_type == "Unknown":
-        return False
-    
-    # Common built-in visual types (comprehensive list)
-    builtin_visuals = {
-        "barChart", "clusteredBarChart", "clusteredColumnChart", "columnChart",
-        "lineChart", "areaChart", "lineClusteredColumnComboChart", "lineStackedColumnComboChart",
-        "pieChart", "donutChart", "funnel", "gauge", "card", "multiRowCard",
-        "table", "matrix", "slicer", "map", "filledMap", "shape", "image",
-        "textbox", "scatterChart", "pivotTable", "treemap", "waterfallChart",
-        "hundredPercentStackedBarChart", "hundredPercentStackedColumnChart",
-        "ribbonChart", "kpi", "decompositionTreeVisual",
-        # Additional built-in visuals
-        "stackedBarChart", "stackedColumnChart", "lineStackedAreaChart",
-        "hundredPercentStackedAreaChart", "stackedAreaChart",
-        "ribbon", "actionButton", "basicShape"
-    }
-    
-    # Check if it's a known built-in visual
-    if visual_type in builtin_visuals:
-        return False
-    
-    # Custom visuals have specific patterns:
-    # 1. Contains alphanumeric GUID-like strings (longer identifiers)
-    # 2. Contains dots (package notation like "publisher.visualname")
-    # 3. Has very long names (>25 characters)
-    
-    if "." in visual_type:  # e.g., "PBI_CV_xxxxx" or "publisher.visual"
-        return True
-    
-    if len(visual_type) > 25:  # Very long names are typically custom
-        return True
-    
-    # If starts with common custom visual prefixes
-    custom_prefixes = ["PBI_CV", "custom", "Custom"]
-    if any(visual_type.startswith(prefix) for prefix in custom_prefixes):
-        return True
-    
-    # Default: if not in built-in list and matches patterns, consider it custom
-    # This is more conservative - unknown short names won't be flagged
-    return False
-
-
-def analyze_workspace_reports(access_token: str, workspace_id: str, workspace_name: str) -> List[Dict]:
-    """
-    Analyze all reports in a workspace for custom visuals.
-    Attempts multiple methods: Direct export, Clone+Export, and page listing.
-    Returns list of dictionaries with analysis results.
-    """
-    print(f"\n{'='*80}")
-    print(f"Analyzing workspace: {workspace_name}")
-    print(f"{'='*80}")
-    
-    reports = get_reports_in_workspace(access_token, workspace_id)
-    print(f"Found {len(reports)} reports\n")
-    
-    results = []
-    
-    for report in reports:
-        report_name = report.get("name", "Unknown")
-        report_id = report.get("id")
-        
-        # Skip if it's already a temp analysis clone
-        if "temp_analysis_" in report_name or "temp_clone_for_analysis" in report_name:
-            continue
-        
-        print(f"\n{'-'*80}")
-        print(f"Report: {report_name}")
-        print(f"Report ID: {report_id}")
-        
-        # Initialize result record
-        result = {
-            "workspace": workspace_name,
-            "report": report_name,
-            "report_id": report_id,
-            "method": "Failed",
-            "num_pages": 0,
-            "is_directlake": "Unknown",
-            "total_visuals": 0,
-            "custom_visuals": 0
-        }
-        
-        pbix_content = None
-        clone_id = None
-        
-        # METHOD 1: Try direct PBIX export
-        print("  [Method 1] Direct PBIX export...")
-        pbix_content = export_report_as_pbix(access_token, workspace_id, report_id, is_clone=False)
-        is_directlake = False
-        clone_id = None
-        
-        # METHOD 2: If direct export fails, try clone + export
-        if not pbix_content:
-            print("  [Method 2] Clone + Export approach...")
-            is_directlake = True  # Likely DirectLake if export failed
-            result["is_directlake"] = "Yes"
-            clone_id = clone_report(access_token, workspace_id, report_id, report_name)
-            
-            if clone_id:
-                # Wait a moment for clone to be ready
-                import time
-                time.sleep(2)
-                
-                # Try to export the clone
-                print(f"  Attempting to export clone...")
-                pbix_content = export_report_as_pbix(access_token, workspace_id, clone_id, is_clone=True)
-                
-                if pbix_content:
-                    print(f"  SUCCESS Clone exported ({len(pbix_content)} bytes)")
-                else:
-                    print(f"  Clone export also failed (DirectLake restriction)")
-        
-        # If we got PBIX content, extract visuals
-        if pbix_content:
-            print(f"  Extracting visuals from PBIX...")
-            
-            # Save PBIX for inspection
-            pbix_filename = f"report_{report_id[:8]}.pbix"
-            with open(pbix_filename, "wb") as f:
-                f.write(pbix_content)
-            print(f"  Saved PBIX: {pbix_filename}")
-            
-            visuals = extract_visuals_from_pbix(pbix_content)
-            
-            if visuals:
-                print(f"  Total visuals found: {len(visuals)}")
-                
-                # Group by page
-                pages = {}
-                for visual in visuals:
-                    page = visual["page"]
-                    if page not in pages:
-                        pages[page] = []
-                    pages[page].append(visual)
-                
-                print(f"\n  Report structure:")
-                for page_name, page_visuals in pages.items():
-                    print(f"    Page '{page_name}': {len(page_visuals)} visuals")
-                
-                # Filter custom visuals
-                custom_visuals = [v for v in visuals if v["is_custom"]]
-                
-                # Update result
-                result["method"] = "Direct Export"
-                result["total_visuals"] = len(visuals)
-                result["custom_visuals"] = len(custom_visuals)
-                result["is_directlake"] = "No"
-                result["num_pages"] = len(pages)
-                
-                if custom_visuals:
-                    print(f"\n  ** CUSTOM VISUALS FOUND ({len(custom_visuals)}) **")
-                    for visual in custom_visuals:
-                        print(f"    - {visual['name']}")
-                        print(f"      Type: {visual['type']}")
-                        print(f"      Page: {visual['page']}")
-                else:
-                    print(f"\n  No custom visuals detected")
-            else:
-                print("  WARNING: Could not extract visual information from PBIX")
-                result["method"] = "Direct Export (No Visuals)"
-                result["is_directlake"] = "No"
-        else:
-            # METHOD 3: Fallback to page listing only
-            print("  [Method 3] Basic page listing (no visual details)...")
-            pages = get_report_pages(access_token, workspace_id, report_id)
-            
-            if pages:
-                print(f"  Report has {len(pages)} page(s):")
-                for page in pages:
-                    print(f"    - {page.get('displayName')}")
-                print(f"\n  NOTE: Cannot extract visual details via API")
-                print(f"  LINK: {report.get('webUrl', 'N/A')}")
-                
-                result["method"] = "Page Listing Only"
-                result["num_pages"] = len(pages)
-            else:
-                print("  ERROR: Could not retrieve page information")
-                result["method"] = "Failed"
-        
-        # Cleanup: delete clone if created
-        if clone_id:
-            print(f"  Cleaning up clone...")
-            delete_report(access_token, workspace_id, clone_id)
-        
-        results.append(result)
-    
-    return results
-
-
-def main():
-    """
-    Main function to scan Power BI reports for custom visuals.
-    """
-    print("Power BI Custom Visual Identifier")
-    print("==================================\n")
-    
-    # Get access token
-    print("Authenticating with service principal...")
-    access_token = get_access_token(CLIENT_ID, TENANT_ID, CLIENT_SECRET)
-    
-    if not access_token:
-        print("Failed to authenticate")
-        return
-    
-    # Get workspaces
-    print("Fetching workspaces...")
-    workspaces = get_workspaces(access_token)
-    print(f"Found {len(workspaces)} workspaces\n")
-    
-    # Collect all results
-    all_results = []
-    
-    # Option 1: Analyze all workspaces
-    for workspace in workspaces:
-        workspace_name = workspace.get("name", "Unknown")
-        workspace_id = workspace.get("id")
-        
-        try:
-            results = analyze_workspace_reports(access_token, workspace_id, workspace_name)
-            all_results.extend(results)
-        except Exception as e:
-            print(f"Error analyzing workspace {workspace_name}: {e}")
-    
-    # Generate CSV report
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = f"pbi_custom_visuals_report_{timestamp}.csv"
-    
-    print(f"\n{'='*80}")
-    print("Generating CSV report...")
-    
-    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['workspace', 'report', 'report_id', 'method', 'num_pages', 
-                      'is_directlake', 'total_visuals', 'custom_visuals']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        for result in all_results:
-            writer.writerow(result)
-    
-    # Summary
-    total_reports = len(all_results)
-    reports_with_custom = sum(1 for r in all_results if r['custom_visuals'] > 0)
-    directlake_reports = sum(1 for r in all_results if r['is_directlake'] == 'Yes')
-    successful_exports = sum(1 for r in all_results if 'Export' in r['method'])
-    
-    print(f"\nCSV report generated: {csv_filename}")
-    print(f"{'='*80}")
-    print(f"SUMMARY:")
-    print(f"  Total reports analyzed: {total_reports}")
-    print(f"  Reports with custom visuals: {reports_with_custom}")
-    print(f"  DirectLake reports: {directlake_reports}")
-    print(f"  Successful PBIX exports: {successful_exports}")
-    print(f"{'='*80}\n")
-    
-    # Option 2: Analyze specific workspace (uncomment and modify as needed)
-    # specific_workspace_id = "YOUR_WORKSPACE_ID"
-    # analyze_workspace_reports(access_token, specific_workspace_id, "My Workspace")
-
-
-if __name__ == "__main__":
-    main()
+"""
+Script to identify custom visuals in Power BI reports published in Microsoft Fabric.
+
+This script uses the Power BI Scanner API to:
+1. Authenticate with Azure AD using service principal
+2. Scan workspaces for detailed metadata
+3. Extract visual information from reports
+4. Identify custom visuals
+"""
+
+import os
+import re
+import requests
+import json
+import shutil
+import sys
+import threading
+import time
+import zipfile
+import csv
+import functools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from msal import ConfidentialClientApplication
+from typing import List, Dict, Optional
+
+try:
+    import orjson  # optional: much faster parse of large Layout documents
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: incremental parse of multi-MB scan results
+except ImportError:
+    ijson = None
+
+
+def _json_loads(data):
+    """Parse JSON (str or bytes) with orjson when available, stdlib otherwise."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Configuration
+CLIENT_ID = "client-id"  # Service Principal (App) ID
+TENANT_ID = "tenant-id"  # Tenant ID
+CLIENT_SECRET = "secret-id"  # Service Principal Secret
+AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+SCOPE = ["https://analysis.windows.net/powerbi/api/.default"]
+PBI_API_BASE = "https://api.powerbi.com/v1.0/myorg"
+
+# Shared HTTP session: keep-alive reuses one TLS connection per pool slot
+# instead of a fresh handshake per API call (the dominant wall-clock cost
+# on large tenants), and the mounted Retry backs off on 429/5xx instead of
+# failing the call outright.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST", "DELETE"],
+        respect_retry_after_header=True
+    )
+))
+
+# Extra request/response tracing (scan request bodies etc.)
+DEBUG = False
+
+# Keep downloaded PBIX files after analysis (debugging aid). Parsing reads
+# the archive from disk, so the streamed download itself stays; by default
+# each file is removed as soon as it's parsed instead of accumulating GBs
+# across a large tenant.
+SAVE_PBIX = False
+
+# Clones created by earlier runs; skipped during analysis
+_SKIP_PREFIXES = ("temp_analysis_", "temp_clone_for_analysis")
+
+# Workspaces analyzed concurrently, and reports within a workspace on a
+# second small pool — each report is a chain of blocking HTTP calls
+# (export, clone, poll), so overlapping them keeps the scan network-bound
+# until Power BI throttling kicks in.
+MAX_WORKSPACE_WORKERS = 8
+MAX_REPORT_WORKERS = 4
+
+# Per-report output is buffered and printed in one shot under this lock so
+# concurrent reports don't interleave their lines.
+_PRINT_LOCK = threading.Lock()
+
+
+def get_access_token(client_id: str, tenant_id: str, client_secret: str) -> Optional[str]:
+    """
+    Authenticate and get access token using service principal (client credentials flow).
+    """
+    authority = f"https://login.microsoftonline.com/{tenant_id}"
+    app = ConfidentialClientApplication(
+        client_id,
+        authority=authority,
+        client_credential=client_secret
+    )
+    
+    # Acquire token using client credentials
+    result = app.acquire_token_for_client(scopes=SCOPE)
+    
+    if "access_token" in result:
+        print("OK Authentication successful with service principal")
+        return result["access_token"]
+    else:
+        print(f"ERROR Authentication failed")
+        print(f"Error: {result.get('error')}")
+        print(f"Error description: {result.get('error_description')}")
+        return None
+
+
+def get_workspaces(access_token: str) -> List[Dict]:
+    """
+    Get all workspaces accessible to the user.
+    """
+    url = f"{PBI_API_BASE}/groups"
+    
+    response = _SESSION.get(url)
+    response.raise_for_status()
+    
+    return _json_loads(response.content).get("value", [])
+
+
+def get_reports_in_workspace(access_token: str, workspace_id: str) -> List[Dict]:
+    """
+    Get all reports in a specific workspace.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports"
+    
+    response = _SESSION.get(url)
+    response.raise_for_status()
+    
+    return _json_loads(response.content).get("value", [])
+
+
+def clone_report(access_token: str, workspace_id: str, report_id: str, report_name: str) -> Optional[str]:
+    """
+    Clone a report to try exporting the clone (may have fewer restrictions).
+    Returns the clone ID if successful.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Clone"
+    clone_name = f"temp_analysis_{report_id[:8]}"
+    
+    body = {
+        "name": clone_name,
+        "targetWorkspaceId": workspace_id
+    }
+    
+    try:
+        response = _SESSION.post(url, json=body)
+        if response.status_code in [200, 201]:
+            clone_id = _json_loads(response.content).get("id")
+            print(f"  Cloned as: {clone_name} (ID: {clone_id})")
+            return clone_id
+        else:
+            return None
+    except requests.RequestException as e:
+        print(f"  Clone request failed: {e}")
+        return None
+
+
+def delete_report(access_token: str, workspace_id: str, report_id: str):
+    """Delete a report (cleanup clones)."""
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}"
+    
+    try:
+        _SESSION.delete(url)
+    except requests.RequestException as e:
+        print(f"  Warning: could not delete report {report_id}: {e}")
+
+
+def wait_for_clone_ready(access_token: str, workspace_id: str, clone_id: str, max_wait: float = 30) -> bool:
+    """
+    Poll until a freshly cloned report is visible, with capped exponential
+    backoff (0.1 -> 0.2 -> 0.4 ... capped at 2s). Fast clones are picked up
+    in tenths of a second instead of a blanket 2s sleep, and slow ones get
+    up to max_wait seconds rather than a single guess.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{clone_id}"
+    deadline = time.monotonic() + max_wait
+    delay = 0.1
+
+    while time.monotonic() < deadline:
+        try:
+            response = _SESSION.get(url)
+            if response.status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 2)
+
+    return False
+
+
+def export_report_as_pbix(access_token: str, workspace_id: str, report_id: str, is_clone: bool = False) -> Optional[str]:
+    """
+    Try to export/download report as PBIX file, streaming the response
+    straight to disk so the archive (potentially tens of MB) is never held
+    in memory. This requires specific permissions but would give us full
+    access to visuals. Returns the path of the downloaded file if successful.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/Export"
+    pbix_path = f"report_{report_id[:8]}.pbix"
+    
+    try:
+        with _SESSION.get(url, stream=True) as response:
+            if response.status_code == 200:
+                with open(pbix_path, "wb") as f:
+                    shutil.copyfileobj(response.raw, f, length=1 << 20)
+                return pbix_path
+            else:
+                # Error bodies aren't always JSON (expired tokens often
+                # come back empty), so don't let the diagnostic parse kill
+                # the whole workspace's analysis
+                try:
+                    error_msg = _json_loads(response.content).get("error", {}).get("code", "Unknown")
+                except (ValueError, AttributeError):
+                    error_msg = "Unknown"
+                if not is_clone:  # Only print error for original, not clone attempts
+                    print(f"  Direct export failed: {error_msg}")
+                return None
+    except (requests.RequestException, OSError):
+        try:
+            os.remove(pbix_path)  # drop any partial download
+        except OSError:
+            pass
+        return None
+
+
+def _decode_layout(raw: bytes) -> Dict:
+    """
+    Decode and parse a PBIX Layout document. PBIX layouts are UTF-16 LE as
+    a rule, UTF-8 in rare repackaged files.
+    """
+    try:
+        text = raw.decode('utf-16-le')
+    except UnicodeDecodeError:
+        text = raw.decode('utf-8')
+    return _json_loads(text)
+
+
+def _new_visuals() -> Dict[str, list]:
+    """
+    Empty visuals accumulator: four parallel lists (structure-of-arrays)
+    instead of one small dict per visual. Consumers only need counts and
+    per-field scans, and flat lists are several times lighter than
+    thousands of four-key dicts.
+    """
+    return {"names": [], "types": [], "customs": [], "pages": []}
+
+
+# Fast path for the double-encoded container config: the only fields the
+# scan needs are the container name (which leads the config object) and
+# the visual type. When both match plainly (no escapes), the 2-5 KB JSON
+# string never needs a full parse.
+_CONFIG_NAME_RE = re.compile(r'^\{"name":\s*"([^"\\]+)"')
+_VISUAL_TYPE_RE = re.compile(r'"visualType":\s*"([^"\\]+)"')
+
+
+def _walk_sections(layout_data: Dict, visuals: Dict[str, list]) -> None:
+    """
+    Collect the visuals of every visualContainer across all Layout
+    sections into the parallel-list accumulator. Each container's config
+    is itself a JSON string (double-encoded by Power BI) parsed once per
+    visual — the hot path for large reports.
+    """
+    # Bind the append methods once — saves an attribute + subscript lookup
+    # per visual on what is the innermost loop of the whole scan
+    names_append = visuals["names"].append
+    types_append = visuals["types"].append
+    customs_append = visuals["customs"].append
+    pages_append = visuals["pages"].append
+
+    for section in layout_data.get("sections", []):
+        # Interned: repeated per container below, and page/type names recur
+        # thousands of times across a tenant — interning stores one copy
+        # and lets later equality checks short-circuit on identity
+        section_name = sys.intern(section.get("displayName", "Unnamed Section"))
+
+        for container in section.get("visualContainers", []):
+            config_str = container.get("config")
+            if config_str is None:
+                continue
+
+            # Pull name and visualType with two regex probes; only fall
+            # back to a full JSON parse when either is absent or escaped
+            name_match = _CONFIG_NAME_RE.match(config_str)
+            type_match = _VISUAL_TYPE_RE.search(config_str)
+
+            if name_match and type_match:
+                name = name_match.group(1)
+                visual_type = sys.intern(type_match.group(1))
+            else:
+                config = _json_loads(config_str)
+                name = config.get("name", "Unnamed")
+                # Direct subscripts beat chained .get(..., {}) here: the
+                # happy path allocates no intermediate default dict
+                try:
+                    visual_type = sys.intern(config["singleVisual"]["visualType"])
+                except KeyError:
+                    visual_type = "Unknown"
+
+            names_append(name)
+            types_append(visual_type)
+            customs_append(is_custom_visual(visual_type))
+            pages_append(section_name)
+
+
+def extract_visuals_from_pbix(pbix_path: str) -> Dict[str, list]:
+    """
+    Extract visual information from a PBIX file on disk into parallel
+    names/types/customs/pages lists.
+    PBIX is a ZIP archive containing JSON files with report metadata;
+    opening it in place means only the central directory and the requested
+    members are read — the rest of the archive stays on disk.
+    """
+    visuals = _new_visuals()
+    
+    try:
+        with zipfile.ZipFile(pbix_path) as zip_file:
+            # The Layout entry lives at a canonical path in PBIX archives;
+            # read it directly instead of scanning the whole name list, and
+            # only fall back to the scan for nonstandard archives.
+            try:
+                file_name = "Report/Layout"
+                layout_bytes = zip_file.read(file_name)
+            except KeyError:
+                file_name = next((n for n in zip_file.namelist()
+                                  if "Layout" in n and not n.endswith("/")), None)
+                layout_bytes = zip_file.read(file_name) if file_name else None
+
+            if layout_bytes is not None:
+                print(f"    Found layout file: {file_name}")
+                try:
+                    _walk_sections(_decode_layout(layout_bytes), visuals)
+                except Exception as e2:
+                    print(f"    Error decoding layout: {e2}")
+    except Exception as e:
+        print(f"  Error extracting visuals from PBIX: {e}")
+    
+    return visuals
+
+
+def get_report_pages(access_token: str, workspace_id: str, report_id: str) -> list:
+    """
+    Get all pages in a report using the regular API.
+    """
+    url = f"{PBI_API_BASE}/groups/{workspace_id}/reports/{report_id}/pages"
+    
+    try:
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        return _json_loads(response.content).get("value", [])
+    except Exception as e:
+        print(f"Error getting pages: {e}")
+        return []
+
+
+# The Scanner API accepts up to 100 workspace IDs per getInfo call
+# (documented Power BI limit)
+MAX_SCAN_BATCH = 100
+
+
+def scan_workspaces(access_token: str, workspace_ids: List[str]) -> List[str]:
+    """
+    Initiate workspace scans using the Scanner API, batching up to
+    MAX_SCAN_BATCH workspace IDs per getInfo call instead of one request
+    per workspace — 100x fewer getInfo/scanStatus/scanResult round trips
+    on large tenants.
+    Returns the list of scan IDs.
+    """
+    # Use admin API endpoint
+    url = "https://api.powerbi.com/v1.0/myorg/admin/workspaces/getInfo"
+    scan_ids = []
+
+    for batch_start in range(0, len(workspace_ids), MAX_SCAN_BATCH):
+        batch = workspace_ids[batch_start:batch_start + MAX_SCAN_BATCH]
+
+        # Request body with ALL options enabled to get maximum metadata
+        # Including visual information requires "Enhance admin APIs responses with detailed metadata" in Admin Portal
+        body = {
+            "workspaces": batch,
+            "datasetExpressions": True,  # Enable to get DAX expressions
+            "datasetSchema": True,       # Enable to get dataset schema
+            "datasourceDetails": True,   # Enable to get datasource details
+            "getArtifactUsers": True,    # Enable to get user info
+            "lineage": True              # Enable to get lineage info
+        }
+
+        if DEBUG:
+            print(f"📤 Request body: {json.dumps(body)}")
+
+        response = _SESSION.post(url, json=body)
+
+        if response.status_code == 202:
+            # Scan accepted, get scan ID from Location header
+            location = response.headers.get("Location", "")
+            scan_id = location.split("/")[-1] if location else None
+            print(f"✓ Scan accepted - Scan ID: {scan_id} ({len(batch)} workspaces)")
+            if scan_id:
+                scan_ids.append(scan_id)
+        else:
+            print(f"❌ Scan request failed: {response.status_code}")
+            print(f"Response: {response.text}")
+            print(f"Response headers: {dict(response.headers)}")
+
+    return scan_ids
+
+
+def get_scan_status(access_token: str, scan_id: str) -> Optional[str]:
+    """
+    Check the status of a workspace scan.
+    Returns 'Succeeded', 'Running', or None if failed.
+    """
+    url = f"https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanStatus/{scan_id}"
+    
+    try:
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        return _json_loads(response.content).get("status")
+    except Exception as e:
+        print(f"Error checking scan status: {e}")
+        return None
+
+
+def wait_for_scans(access_token: str, scan_ids: List[str],
+                   max_wait: float = 300) -> List[str]:
+    """
+    Wait for a batch of scans to finish, polling all still-pending IDs
+    concurrently each round (they share the pooled session) with capped
+    exponential backoff between rounds — wall time per round is one poll
+    latency, not one per scan. Returns the IDs that reached Succeeded.
+    """
+    pending = list(scan_ids)
+    succeeded = []
+    delay = 0.5
+    deadline = time.monotonic() + max_wait
+
+    while pending and time.monotonic() < deadline:
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            statuses = list(executor.map(
+                lambda scan_id: get_scan_status(access_token, scan_id), pending))
+
+        still_pending = []
+        for scan_id, status in zip(pending, statuses):
+            if status == "Succeeded":
+                succeeded.append(scan_id)
+            elif status in ("Running", "NotStarted", None):
+                # None = transient status-check error; poll it again
+                still_pending.append(scan_id)
+            else:
+                print(f"❌ Scan {scan_id} ended with status: {status}")
+        pending = still_pending
+
+        if pending:
+            time.sleep(delay)
+            delay = min(delay * 2, 8)
+
+    for scan_id in pending:
+        print(f"❌ Scan {scan_id} still pending after {max_wait}s")
+
+    return succeeded
+
+
+def get_scan_result(access_token: str, scan_id: str) -> Optional[Dict]:
+    """
+    Get the result of a completed workspace scan.
+    """
+    url = f"https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanResult/{scan_id}"
+    
+    try:
+        response = _SESSION.get(url)
+        response.raise_for_status()
+        return _json_loads(response.content)
+    except Exception as e:
+        print(f"Error getting scan result: {e}")
+        return None
+
+
+def iter_scan_workspaces(access_token: str, scan_id: str):
+    """
+    Yield the workspaces of a completed scan one at a time. With ijson
+    installed, the scanResult body (50-200 MB on large tenants) is parsed
+    incrementally off the streamed response so only one workspace is ever
+    materialized; without it, the buffered result is fetched and iterated.
+    Feed each workspace to collect_workspace_visuals.
+    """
+    if ijson is not None:
+        url = f"https://api.powerbi.com/v1.0/myorg/admin/workspaces/scanResult/{scan_id}"
+        try:
+            with _SESSION.get(url, stream=True) as response:
+                response.raise_for_status()
+                # urllib3 leaves the body gzip-compressed on .raw unless told
+                response.raw.decode_content = True
+                yield from ijson.items(response.raw, "workspaces.item")
+            return
+        except requests.RequestException as e:
+            print(f"Error streaming scan result: {e}")
+            return
+
+    scan_data = get_scan_result(access_token, scan_id)
+    if scan_data:
+        yield from scan_data.get("workspaces", [])
+
+
+def collect_workspace_visuals(workspace: Dict, report_visuals: Dict[str, Dict],
+                              debug: bool = False) -> None:
+    """
+    Collect the visuals of every report in one scanned workspace into
+    report_visuals (report ID -> name + visuals accumulator).
+    """
+    reports = workspace.get("reports", [])
+    
+    if debug:
+        print(f"🔍 DEBUG: Workspace has {len(reports)} reports")
+    
+    for report in reports:
+        report_id = report.get("id")
+        report_name = report.get("name", "Unknown")
+        pages = report.get("pages", [])
+        
+        if debug:
+            print(f"\n🔍 DEBUG: Report '{report_name}' ({report_id})")
+            print(f"   Pages: {len(pages)}")
+        
+        all_visuals = _new_visuals()
+        
+        for page in pages:
+            page_name = sys.intern(page.get("name", "Unnamed Page"))
+            visuals = page.get("visuals", [])
+            
+            if debug and visuals:
+                print(f"   Page '{page_name}': {len(visuals)} visuals")
+            
+            for visual in visuals:
+                visual_type = sys.intern(visual.get("visualType", "Unknown"))
+                
+                if debug:
+                    print(f"      - Type: {visual_type}")
+                
+                all_visuals["names"].append(visual.get("name", "Unnamed"))
+                all_visuals["types"].append(visual_type)
+                all_visuals["customs"].append(is_custom_visual(visual_type))
+                all_visuals["pages"].append(page_name)
+        
+        report_visuals[report_id] = {
+            "name": report_name,
+            "visuals": all_visuals
+        }
+
+
+def extract_visuals_from_scan(scan_data: Dict, debug: bool = False) -> Dict[str, List[Dict]]:
+    """
+    Extract visual information from Scanner API result.
+    Returns a dictionary mapping report IDs to their visuals.
+    For results too large to buffer, iterate iter_scan_workspaces and call
+    collect_workspace_visuals per workspace instead.
+    """
+    report_visuals = {}
+    
+    # Save scan data for debugging if needed
+    if debug:
+        if orjson is not None:
+            with open("scan_debug.json", "wb") as f:
+                f.write(orjson.dumps(scan_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open("scan_debug.json", "w", encoding="utf-8") as f:
+                json.dump(scan_data, f, indent=2)
+        print("📝 Scan data saved to scan_debug.json")
+    
+    try:
+        workspaces = scan_data.get("workspaces", [])
+        
+        if debug:
+            print(f"\n🔍 DEBUG: Found {len(workspaces)} workspaces in scan data")
+        
+        for workspace in workspaces:
+            collect_workspace_visuals(workspace, report_visuals, debug=debug)
+    
+    except Exception as e:
+        print(f"Error extracting visuals from scan: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    return report_visuals
+
+
+# Known built-in visual types (comprehensive list), hoisted to module
+# level so the set isn't rebuilt for every visual classified
+_BUILTIN_VISUALS = frozenset({
+    "barChart", "clusteredBarChart", "clusteredColumnChart", "columnChart",
+    "lineChart", "areaChart", "lineClusteredColumnComboChart", "lineStackedColumnComboChart",
+    "pieChart", "donutChart", "funnel", "gauge", "card", "multiRowCard",
+    "table", "matrix", "slicer", "map", "filledMap", "shape", "image",
+    "textbox", "scatterChart", "pivotTable", "treemap", "waterfallChart",
+    "hundredPercentStackedBarChart", "hundredPercentStackedColumnChart",
+    "ribbonChart", "kpi", "decompositionTreeVisual",
+    # Additional built-in visuals
+    "stackedBarChart", "stackedColumnChart", "lineStackedAreaChart",
+    "hundredPercentStackedAreaChart", "stackedAreaChart",
+    "ribbon", "actionButton", "basicShape"
+})
+
+# One compiled pass fuses the custom-visual heuristics: package dots
+# (e.g. "publisher.visualname"), PBI_CV/custom prefixes, and very long
+# names (>25 chars)
+_CUSTOM_RE = re.compile(r"\.|^(?:PBI_CV|[Cc]ustom)|.{26,}")
+
+
+@functools.lru_cache(maxsize=1024)
+def is_custom_visual(visual_type: str) -> bool:
+    """
+    Determine if a visual type is a custom visual. Pure on its string
+    argument and reports repeat the same handful of types thousands of
+    times, so results are memoized — repeat hits are a dict lookup.
+    Built-in visuals have specific type names, custom visuals typically
+    have longer identifiers.
+    Unknown short names that match none of the patterns won't be flagged
+    (conservative default).
+    """
+    if not visual_type or visual_type == "Unknown":
+        return False
+    
+    # Check if it's a known built-in visual
+    if visual_type in _BUILTIN_VISUALS:
+        return False
+    
+    return _CUSTOM_RE.search(visual_type) is not None
+
+
+def _analyze_single_report(access_token: str, workspace_id: str, workspace_name: str,
+                           report: Dict) -> Optional[Dict]:
+    """
+    Analyze one report for custom visuals (direct export, then clone+export,
+    then page listing). Returns a result dict, or None for temp clones.
+    Output lines are buffered and printed in one block so concurrent
+    reports don't interleave.
+    """
+    report_name = report.get("name", "Unknown")
+    report_id = report.get("id")
+
+    # Skip if it's already a temp analysis clone
+    if report_name.startswith(_SKIP_PREFIXES):
+        return None
+
+    out = []
+    out.append(f"\n{'-'*80}")
+    out.append(f"Report: {report_name}")
+    out.append(f"Report ID: {report_id}")
+
+    # Initialize result record
+    result = {
+        "workspace": workspace_name,
+        "report": report_name,
+        "report_id": report_id,
+        "method": "Failed",
+        "num_pages": 0,
+        "is_directlake": "Unknown",
+        "total_visuals": 0,
+        "custom_visuals": 0
+    }
+
+    pbix_path = None
+    clone_id = None
+
+    # METHOD 1: Try direct PBIX export
+    out.append("  [Method 1] Direct PBIX export...")
+    pbix_path = export_report_as_pbix(access_token, workspace_id, report_id, is_clone=False)
+
+    # METHOD 2: If direct export fails, try clone + export
+    if not pbix_path:
+        out.append("  [Method 2] Clone + Export approach...")
+        result["is_directlake"] = "Yes"  # Likely DirectLake if export failed
+        clone_id = clone_report(access_token, workspace_id, report_id, report_name)
+
+        if clone_id:
+            # Wait until the clone is actually visible before exporting
+            if not wait_for_clone_ready(access_token, workspace_id, clone_id):
+                out.append("  Clone not ready in time, trying export anyway")
+
+            # Try to export the clone
+            out.append(f"  Attempting to export clone...")
+            pbix_path = export_report_as_pbix(access_token, workspace_id, clone_id, is_clone=True)
+
+            if pbix_path:
+                out.append(f"  SUCCESS Clone exported ({os.path.getsize(pbix_path)} bytes)")
+            else:
+                out.append(f"  Clone export also failed (DirectLake restriction)")
+
+    # If we got a PBIX on disk, extract visuals
+    if pbix_path:
+        out.append(f"  Extracting visuals from PBIX...")
+
+        visuals = extract_visuals_from_pbix(pbix_path)
+
+        # The file was only needed for parsing; keep it only on request
+        if SAVE_PBIX:
+            out.append(f"  Saved PBIX: {pbix_path}")
+        else:
+            try:
+                os.remove(pbix_path)
+            except OSError as e:
+                out.append(f"  Warning: could not delete PBIX: {e}")
+        total_visuals = len(visuals["types"])
+
+        if total_visuals:
+            out.append(f"  Total visuals found: {total_visuals}")
+
+            # Per-page visual counts straight off the pages column
+            page_counts = Counter(visuals["pages"])
+
+            out.append(f"\n  Report structure:")
+            for page_name, count in page_counts.items():
+                out.append(f"    Page '{page_name}': {count} visuals")
+
+            custom_count = sum(visuals["customs"])
+
+            # Update result
+            result["method"] = "Direct Export"
+            result["total_visuals"] = total_visuals
+            result["custom_visuals"] = custom_count
+            result["is_directlake"] = "No"
+            result["num_pages"] = len(page_counts)
+
+            if custom_count:
+                out.append(f"\n  ** CUSTOM VISUALS FOUND ({custom_count}) **")
+                for name, vtype, is_custom, page in zip(visuals["names"], visuals["types"],
+                                                        visuals["customs"], visuals["pages"]):
+                    if is_custom:
+                        out.append(f"    - {name}")
+                        out.append(f"      Type: {vtype}")
+                        out.append(f"      Page: {page}")
+            else:
+                out.append(f"\n  No custom visuals detected")
+        else:
+            out.append("  WARNING: Could not extract visual information from PBIX")
+            result["method"] = "Direct Export (No Visuals)"
+            result["is_directlake"] = "No"
+    else:
+        # METHOD 3: Fallback to page listing only
+        out.append("  [Method 3] Basic page listing (no visual details)...")
+        pages = get_report_pages(access_token, workspace_id, report_id)
+
+        if pages:
+            out.append(f"  Report has {len(pages)} page(s):")
+            for page in pages:
+                out.append(f"    - {page.get('displayName')}")
+            out.append(f"\n  NOTE: Cannot extract visual details via API")
+            out.append(f"  LINK: {report.get('webUrl', 'N/A')}")
+
+            result["method"] = "Page Listing Only"
+            result["num_pages"] = len(pages)
+        else:
+            out.append("  ERROR: Could not retrieve page information")
+            result["method"] = "Failed"
+
+    # Cleanup: delete clone if created
+    if clone_id:
+        out.append(f"  Cleaning up clone...")
+        delete_report(access_token, workspace_id, clone_id)
+
+    with _PRINT_LOCK:
+        print("\n".join(out))
+
+    return result
+
+
+def analyze_workspace_reports(access_token: str, workspace_id: str, workspace_name: str) -> List[Dict]:
+    """
+    Analyze all reports in a workspace for custom visuals.
+    Attempts multiple methods: Direct export, Clone+Export, and page listing.
+    Reports are analyzed concurrently on a small pool since each one is
+    dominated by blocking HTTP I/O. Returns list of dictionaries with
+    analysis results.
+    """
+    # The workspace name is repeated into every result row it produces
+    workspace_name = sys.intern(workspace_name)
+
+    with _PRINT_LOCK:
+        print(f"\n{'='*80}")
+        print(f"Analyzing workspace: {workspace_name}")
+        print(f"{'='*80}")
+
+    reports = get_reports_in_workspace(access_token, workspace_id)
+    with _PRINT_LOCK:
+        print(f"Found {len(reports)} reports\n")
+
+    results = []
+
+    with ThreadPoolExecutor(max_workers=MAX_REPORT_WORKERS) as executor:
+        for result in executor.map(
+                lambda report: _analyze_single_report(access_token, workspace_id, workspace_name, report),
+                reports):
+            if result is not None:
+                results.append(result)
+
+    return results
+
+
+def main():
+    """
+    Main function to scan Power BI reports for custom visuals.
+    """
+    print("Power BI Custom Visual Identifier")
+    print("==================================\n")
+    
+    # Get access token
+    print("Authenticating with service principal...")
+    access_token = get_access_token(CLIENT_ID, TENANT_ID, CLIENT_SECRET)
+    
+    if not access_token:
+        print("Failed to authenticate")
+        return
+
+    # One bearer header on the shared session instead of a fresh dict per
+    # API call; every helper below rides on the session default.
+    _SESSION.headers.update({"Authorization": f"Bearer {access_token}"})
+    
+    # Get workspaces
+    print("Fetching workspaces...")
+    workspaces = get_workspaces(access_token)
+    print(f"Found {len(workspaces)} workspaces\n")
+    
+    # CSV is written as workspaces complete (a crash keeps partial results
+    # durable), with running counters instead of re-scanning an in-memory
+    # result list at the end.
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = f"pbi_custom_visuals_report_{timestamp}.csv"
+    fieldnames = ['workspace', 'report', 'report_id', 'method', 'num_pages', 
+                  'is_directlake', 'total_visuals', 'custom_visuals']
+
+    total_reports = 0
+    reports_with_custom = 0
+    directlake_reports = 0
+    successful_exports = 0
+
+    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+        # Option 1: Analyze all workspaces concurrently — each one is a
+        # chain of blocking API calls, so overlapping them keeps the scan
+        # network-bound instead of serial.
+        with ThreadPoolExecutor(max_workers=MAX_WORKSPACE_WORKERS) as executor:
+            futures = {
+                executor.submit(analyze_workspace_reports, access_token,
+                                workspace.get("id"), workspace.get("name", "Unknown")): workspace
+                for workspace in workspaces
+            }
+
+            for future in as_completed(futures):
+                workspace = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Error analyzing workspace {workspace.get('name', 'Unknown')}: {e}")
+                    continue
+
+                for result in results:
+                    writer.writerow(result)
+                    total_reports += 1
+                    reports_with_custom += result['custom_visuals'] > 0
+                    directlake_reports += result['is_directlake'] == 'Yes'
+                    successful_exports += 'Export' in result['method']
+                csvfile.flush()  # keep partial results durable
+    
+    # Summary
+    print(f"\nCSV report generated: {csv_filename}")
+    print(f"{'='*80}")
+    print(f"SUMMARY:")
+    print(f"  Total reports analyzed: {total_reports}")
+    print(f"  Reports with custom visuals: {reports_with_custom}")
+    print(f"  DirectLake reports: {directlake_reports}")
+    print(f"  Successful PBIX exports: {successful_exports}")
+    print(f"{'='*80}\n")
+    
+    # Option 2: Analyze specific workspace (uncomment and modify as needed)
+    # specific_workspace_id = "YOUR_WORKSPACE_ID"
+    # analyze_workspace_reports(access_token, specific_workspace_id, "My Workspace")
+
+
+if __name__ == "__main__":
+    main()